@@ -1,14 +1,25 @@
-from flask import Flask, send_from_directory
+from flask import Flask, jsonify
+import click
 from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
 import os
+import time
+from .assets import build_assets, serve_asset
+from .group_commit import GroupCommitWriter
+from .metrics import init_metrics, init_traffic_recorder
+from .migrations import MIGRATIONS, migrate, schema_version
+from .server import sse_stream_limit
+from .database import configure_sqlite, engine_options_from_env, sqlite_pragmas_from_env
+from .tenants import TenantSession, init_tenants, use_tenant
 
 # Carrega variáveis de ambiente do arquivo .env
 load_dotenv()
 # Inicializando a db
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': TenantSession})
 
 def create_app(config_name=None):
+    started = time.perf_counter()
     app = Flask(__name__)
 
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'default_secret_key')
@@ -18,27 +29,167 @@ def create_app(config_name=None):
             TESTING=True,
             DEBUG=False
         )
+    elif config_name == 'production':
+        # Perfil de produção: WAL, pragmas ajustados e pool configurável
+        app.config.from_mapping(
+            SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///tasks.db'),
+            SQLALCHEMY_ENGINE_OPTIONS = engine_options_from_env(os.environ),
+            SQLITE_PRAGMAS = sqlite_pragmas_from_env(os.environ),
+            SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500)),
+            GROUP_COMMIT = os.getenv('GROUP_COMMIT', '0') == '1',
+            GROUP_COMMIT_WINDOW_MS = float(os.getenv('GROUP_COMMIT_WINDOW_MS', 2)),
+            GROUP_COMMIT_MAX_BATCH = int(os.getenv('GROUP_COMMIT_MAX_BATCH', 64)),
+            GROUP_COMMIT_SYNCHRONOUS = os.getenv('GROUP_COMMIT_SYNCHRONOUS'),
+            TENANT_DB_DIR = os.getenv('TENANT_DB_DIR'),
+            TENANT_MAX_OPEN = int(os.getenv('TENANT_MAX_OPEN', 64)),
+            TENANT_IDLE_SECONDS = float(os.getenv('TENANT_IDLE_SECONDS', 300)),
+            ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 30)),
+            ARCHIVE_CHUNK_SIZE = int(os.getenv('ARCHIVE_CHUNK_SIZE', 500)),
+            TOMBSTONE_RETENTION_VERSIONS = int(os.getenv('TOMBSTONE_RETENTION_VERSIONS', 100000)),
+            TRAFFIC_RECORD_PATH = os.getenv('TRAFFIC_RECORD_PATH'),
+            READ_MODEL = os.getenv('READ_MODEL', '0') == '1',
+            READ_MODEL_VERIFY_SECONDS = float(os.getenv('READ_MODEL_VERIFY_SECONDS', 60)),
+            EVENTS_POLL_SECONDS = float(os.getenv('EVENTS_POLL_SECONDS', 1)),
+            SSE_MAX_STREAMS = sse_stream_limit(os.environ),
+            DEBUG=False
+        )
     else:
         app.config.from_mapping(
-            SQLALCHEMY_DATABASE_URI = 'sqlite:///tasks.db'
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///tasks.db',
+            TRAFFIC_RECORD_PATH = os.getenv('TRAFFIC_RECORD_PATH'),
         )
 
     db.init_app(app)
+    with app.app_context():
+        configure_sqlite(db.engine, app.config.get('SQLITE_PRAGMAS'))
+        if app.config.get('METRICS_ENABLED', True):
+            init_metrics(app, db.engine)
+    init_tenants(app, db.metadata)
+    if app.config.get('TRAFFIC_RECORD_PATH'):
+        init_traffic_recorder(app, app.config['TRAFFIC_RECORD_PATH'])
+
+    # Escrita concorrente que esgotou o busy_timeout: 503 para o cliente tentar
+    # de novo, em vez de um 500 genérico
+    @app.errorhandler(OperationalError)
+    def database_locked(error):
+        if 'database is locked' not in str(error.orig):
+            raise error
+        response = jsonify({"error": "database is locked"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
 
     # Registrar o blueprint de rotas
     from .routes import task_bp
     app.register_blueprint(task_bp, url_prefix='/tasks')
+    if 'tenants' in app.extensions:
+        # Mesmas rotas com o tenant no caminho, alternativa ao cabeçalho X-Tenant
+        app.register_blueprint(task_bp, url_prefix='/t/<tenant>/tasks', name='tenant_tasks')
+
+    # Liveness: o processo responde; readiness: banco acessível e esquema em dia
+    @app.route('/healthz')
+    def liveness():
+        return jsonify({"status": "ok"}), 200
+
+    @app.route('/readyz')
+    def readiness():
+        try:
+            with db.engine.connect() as connection:
+                ready = schema_version(connection) >= len(MIGRATIONS)
+        except SQLAlchemyError:
+            ready = False
+        if not ready:
+            return jsonify({"status": "unavailable"}), 503
+        return jsonify({"status": "ready"}), 200
+
+    # Rotas para servir o frontend: arquivos preparados na inicialização, com
+    # hash no nome e versões comprimidas escolhidas pelo Accept-Encoding
+    assets = build_assets(os.path.join(app.root_path, '..', 'frontend'))
+    app.extensions['assets'] = assets
 
-    # Rotas para servir o frontend
     @app.route('/')
     def serve_index():
-        return send_from_directory('../frontend', 'index.html')
+        return serve_asset(assets, 'index.html')
 
     @app.route('/<path:filename>')
     def serve_static_files(filename):
-        return send_from_directory('../frontend', filename)
-    
+        return serve_asset(assets, filename)
+
+    if app.config.get('GROUP_COMMIT'):
+        app.extensions['group_commit'] = GroupCommitWriter(
+            app, db,
+            window_ms=app.config.get('GROUP_COMMIT_WINDOW_MS', 2.0),
+            max_batch=app.config.get('GROUP_COMMIT_MAX_BATCH', 64),
+            synchronous=app.config.get('GROUP_COMMIT_SYNCHRONOUS'),
+        )
+
+    if app.config.get('EVENTS_POLL_SECONDS'):
+        # Eventos de alterações feitas pelos outros workers, lidos do banco
+        from .events import broker
+        from .relay import EventRelay
+
+        app.extensions['event_relay'] = EventRelay(
+            app, db, broker, interval=app.config['EVENTS_POLL_SECONDS']
+        )
+
     with app.app_context():
-        db.create_all()
+        applied = migrate(db.engine, db.metadata)
+
+    if app.config.get('READ_MODEL'):
+        # Espelho em memória das tarefas do banco principal para a listagem
+        from .events import broker
+        from .models import TaskManager
+        from .read_model import ReadModel
+
+        read_model = ReadModel(app, verify_seconds=app.config.get('READ_MODEL_VERIFY_SECONDS', 60))
+        with app.app_context():
+            read_model.load(TaskManager(db))
+            db.session.remove()
+        # Referência fraca no broker: o listener sai junto com o app
+        broker.add_listener(read_model.apply)
+        app.extensions['read_model'] = read_model
+
+    @app.cli.command('migrate')
+    def migrate_command():
+        with app.app_context():
+            print(f"{migrate(db.engine, db.metadata)} migração(ões) aplicada(s)")
+
+    @app.cli.command('archive')
+    @click.option('--days', type=int, default=None, help='Idade mínima das tarefas concluídas.')
+    @click.option('--tenant', default=None, help='Arquiva no banco de um tenant.')
+    def archive_command(days, tenant):
+        from .models import TaskManager
+
+        if days is None:
+            days = app.config.get('ARCHIVE_AFTER_DAYS', 30)
+        with app.app_context(), use_tenant(tenant):
+            archived = TaskManager(db).archive_completed(
+                older_than_days=days, chunk_size=app.config.get('ARCHIVE_CHUNK_SIZE', 500)
+            )
+        print(f"{archived} tarefa(s) arquivada(s)")
+
+    @app.cli.group('tenant')
+    def tenant_command():
+        """Gerencia os bancos dos tenants."""
+
+    @tenant_command.command('create')
+    @click.argument('name')
+    def create_tenant_command(name):
+        if 'tenants' not in app.extensions:
+            raise click.ClickException("Defina TENANT_DB_DIR para habilitar os tenants")
+        try:
+            app.extensions['tenants'].create(name)
+        except ValueError as error:
+            raise click.ClickException(str(error))
+        print(f"Tenant {name} criado")
+
+    # Tempo de inicialização, exposto também em /metrics
+    startup_seconds = time.perf_counter() - started
+    app.extensions['startup'] = {"seconds": startup_seconds, "migrations_applied": applied}
+    if 'metrics' in app.extensions:
+        app.extensions['metrics'].set_gauge(
+            'app_startup_seconds', startup_seconds, 'Tempo de execução do create_app.'
+        )
+    app.logger.info("Aplicação iniciada em %.1f ms (%d migrações aplicadas)",
+                    startup_seconds * 1000, applied)
 
     return app
@@ -0,0 +1,91 @@
+# Arquivos do frontend preparados na inicialização: cada um ganha um nome com
+# o hash do conteúdo (servido com cache imutável) e versões comprimidas em
+# gzip e, se o módulo brotli estiver instalado, br. O index.html é reescrito
+# para apontar para os nomes com hash.
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import Response, abort, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+ASSET_REFERENCE = re.compile(r'(?P<attribute>(?:src|href)=")(?P<name>[^"]+)(?P<end>")')
+
+
+class Asset:
+    __slots__ = ('variants', 'mimetype', 'etag', 'cache_control')
+
+    def __init__(self, content, mimetype, cache_control):
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.etag = hashlib.sha256(content).hexdigest()[:16]
+        self.variants = {'identity': content}
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) < len(content):
+            self.variants['gzip'] = compressed
+        if brotli is not None:
+            compressed = brotli.compress(content)
+            if len(compressed) < len(content):
+                self.variants['br'] = compressed
+
+
+def _fingerprint(name, content):
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    stem, extension = os.path.splitext(name)
+    return f"{stem}.{digest}{extension}"
+
+
+def build_assets(directory, index='index.html'):
+    # Retorna {caminho: Asset}, com os nomes originais e os com hash
+    assets = {}
+    manifest = {}
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, directory).replace(os.sep, '/')
+            if name == index:
+                continue
+            with open(path, 'rb') as file:
+                content = file.read()
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            hashed = _fingerprint(name, content)
+            manifest[name] = hashed
+            assets[hashed] = Asset(content, mimetype, IMMUTABLE)
+            # O nome original continua disponível, mas sempre revalidado
+            assets[name] = Asset(content, mimetype, 'no-cache')
+
+    index_path = os.path.join(directory, index)
+    if os.path.exists(index_path):
+        with open(index_path, encoding='utf-8') as file:
+            html = file.read()
+        html = ASSET_REFERENCE.sub(
+            lambda match: match['attribute'] + manifest.get(match['name'], match['name']) + match['end'],
+            html,
+        )
+        assets[index] = Asset(html.encode('utf-8'), 'text/html', 'no-cache')
+    return assets
+
+
+def serve_asset(assets, name):
+    asset = assets.get(name)
+    if asset is None:
+        abort(404)
+    encoding = 'identity'
+    for candidate in ('br', 'gzip'):
+        if candidate in asset.variants and request.accept_encodings[candidate]:
+            encoding = candidate
+            break
+    response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = asset.cache_control
+    response.vary.add('Accept-Encoding')
+    response.set_etag(f"{asset.etag}-{encoding}")
+    return response.make_conditional(request)
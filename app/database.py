@@ -0,0 +1,34 @@
+from sqlalchemy import event
+
+
+def sqlite_pragmas_from_env(env):
+    # Pragmas aplicados a cada nova conexão SQLite do perfil de produção
+    return {
+        'journal_mode': env.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': env.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(env.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'mmap_size': int(env.get('SQLITE_MMAP_SIZE', 268435456)),
+        'cache_size': int(env.get('SQLITE_CACHE_SIZE', -64000)),
+    }
+
+
+def engine_options_from_env(env):
+    return {
+        'pool_size': int(env.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(env.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(env.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(env.get('DB_POOL_RECYCLE', 3600)),
+        'pool_pre_ping': True,
+    }
+
+
+def configure_sqlite(engine, pragmas):
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
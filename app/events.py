@@ -0,0 +1,123 @@
+import queue
+import threading
+import weakref
+from collections import deque
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .tenants import current_tenant
+
+
+class EventBroker:
+    # Publica eventos de alteração para os assinantes do stream SSE deste
+    # processo. Cada tenant é um canal; None é o banco principal
+
+    def __init__(self, max_queue_size=1000, local_versions=1000):
+        self.max_queue_size = max_queue_size
+        self.local_versions = local_versions
+        self._subscribers = {}
+        self._listeners = {}
+        # Versões publicadas por commits deste processo, por canal: o repasse
+        # entre processos (app/relay.py) não as envia de novo
+        self._published = {}
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback, channel=None):
+        # Chamado de forma síncrona, na thread do commit, antes das filas SSE.
+        # Métodos são guardados por referência fraca: o broker é global e não
+        # deve manter vivo o objeto (e o app) de quem se registrou
+        if hasattr(callback, '__self__'):
+            reference = weakref.WeakMethod(callback)
+        else:
+            def reference():
+                return callback
+        with self._lock:
+            self._listeners.setdefault(channel, []).append(reference)
+
+    def remove_listener(self, callback, channel=None):
+        with self._lock:
+            listeners = self._listeners.get(channel, [])
+            listeners[:] = [reference for reference in listeners
+                            if reference() is not None and reference() != callback]
+
+    def listeners(self, channel=None):
+        # Descarta as referências de objetos já coletados
+        with self._lock:
+            references = self._listeners.get(channel, [])
+            references[:] = [reference for reference in references if reference() is not None]
+            return [reference() for reference in references]
+
+    def subscribe(self, channel=None, limit=None):
+        # Com limit, retorna None se o processo já tem esse número de assinantes
+        subscription = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            if limit and sum(len(subscribers) for subscribers in self._subscribers.values()) >= limit:
+                return None
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription, channel=None):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+
+    def channels(self):
+        with self._lock:
+            return list(self._subscribers)
+
+    def published_locally(self, channel, version):
+        with self._lock:
+            return version in self._published.get(channel, ())
+
+    def publish(self, events, channel=None):
+        with self._lock:
+            published = self._published.setdefault(channel, deque(maxlen=self.local_versions))
+            published.extend({item["version"] for item in events if "version" in item})
+        for callback in self.listeners(channel):
+            callback(events)
+        self.broadcast(events, channel)
+
+    def broadcast(self, events, channel=None):
+        # Só para os assinantes SSE: usado para alterações de outros processos
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            for item in events:
+                try:
+                    subscription.put_nowait(item)
+                except queue.Full:
+                    # Assinante lento: descarta a fila e pede que recarregue a lista
+                    _drain(subscription)
+                    subscription.put_nowait({"type": "resync"})
+                    break
+
+
+def _drain(subscription):
+    try:
+        while True:
+            subscription.get_nowait()
+    except queue.Empty:
+        pass
+
+
+broker = EventBroker()
+
+
+def queue_event(session, item):
+    # Eventos só são publicados depois que a transação for confirmada
+    session.info.setdefault('pending_events', []).append(item)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_pending_events(session):
+    pending = session.info.pop('pending_events', None)
+    if pending:
+        broker.publish(pending, channel=current_tenant.get())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_events(session):
+    session.info.pop('pending_events', None)
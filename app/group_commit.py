@@ -0,0 +1,117 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .tenants import current_tenant, use_tenant
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    # Escritor único: agrupa as alterações concorrentes do TaskManager em uma
+    # transação compartilhada, pagando um fsync por lote em vez de um por escrita
+
+    def __init__(self, app, db, window_ms=2.0, max_batch=64, synchronous=None, timeout=30.0):
+        self.app = app
+        self.db = db
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.synchronous = synchronous
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, method, args=(), kwargs=None):
+        future = Future()
+        self._queue.put((current_tenant.get(), method, args, kwargs or {}, future))
+        self._ensure_started()
+        return future.result(timeout=self.timeout)
+
+    def _ensure_started(self):
+        # Iniciado sob demanda, para que a thread exista só depois do fork
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=self.timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None, True
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        from .models import TaskManager
+
+        with self.app.app_context():
+            session = self.db.session()
+            # Os objetos retornados são usados por outras threads após o commit
+            session.expire_on_commit = False
+            manager = TaskManager(self.db, deferred=True)
+            stop = False
+            while not stop:
+                batch, stop = self._collect()
+                # Cada tenant tem o próprio banco: um lote vira uma transação por tenant
+                groups = {}
+                for tenant, *item in batch or ():
+                    groups.setdefault(tenant, []).append(item)
+                for tenant, items in groups.items():
+                    with use_tenant(tenant):
+                        self._apply(session, manager, items)
+
+    def _apply(self, session, manager, batch):
+        outcomes = []
+        try:
+            connection = session.connection()
+            if self.synchronous:
+                connection.exec_driver_sql(f"PRAGMA synchronous={self.synchronous}")
+            # Transação explícita para que cada SAVEPOINT fique aninhado nela
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            for method, args, kwargs, future in batch:
+                pending = list(session.info.get('pending_events', []))
+                try:
+                    with session.begin_nested():
+                        result = getattr(manager, method)(*args, **kwargs)
+                    outcomes.append((future, result, None))
+                except Exception as error:
+                    # Só a operação que falhou é desfeita, junto com seus eventos
+                    session.info['pending_events'] = pending
+                    outcomes.append((future, None, error))
+            session.commit()
+        except Exception as error:
+            session.rollback()
+            for _, _, _, future in batch:
+                future.set_exception(error)
+            return
+        finally:
+            session.expunge_all()
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -0,0 +1,190 @@
+import json
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+class _EndpointStats:
+    __slots__ = ('buckets', 'count', 'latency_sum', 'queries', 'db_time', 'response_bytes')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.latency_sum = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.response_bytes = 0
+
+
+class Metrics:
+    # Métricas por processo, expostas em /metrics no formato texto do Prometheus
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._statuses = {}
+        self._gauges = {}
+
+    def set_gauge(self, name, value, description):
+        with self._lock:
+            self._gauges[name] = (value, description)
+
+    def observe(self, method, endpoint, status, duration, queries, db_time, size):
+        bucket = bisect_left(LATENCY_BUCKETS, duration)
+        with self._lock:
+            stats = self._endpoints.get((method, endpoint))
+            if stats is None:
+                stats = self._endpoints[(method, endpoint)] = _EndpointStats()
+            stats.buckets[bucket] += 1
+            stats.count += 1
+            stats.latency_sum += duration
+            stats.queries += queries
+            stats.db_time += db_time
+            stats.response_bytes += size
+            key = (method, endpoint, status)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    def render(self):
+        with self._lock:
+            endpoints = [(key, stats.buckets[:], stats.count, stats.latency_sum,
+                          stats.queries, stats.db_time, stats.response_bytes)
+                         for key, stats in sorted(self._endpoints.items())]
+            statuses = sorted(self._statuses.items())
+            gauges = sorted(self._gauges.items())
+
+        lines = []
+        for name, (value, description) in gauges:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge", f"{name} {value}"]
+        lines += [
+            "# HELP http_requests_total Requisições atendidas por endpoint e status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, endpoint, status), count in statuses:
+            lines.append(f"http_requests_total{{{_labels(method=method, endpoint=endpoint, status=status)}}} {count}")
+
+        lines += [
+            "# HELP http_request_duration_seconds Latência das requisições por endpoint.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, endpoint), buckets, count, latency_sum, *_ in endpoints:
+            labels = _labels(method=method, endpoint=endpoint)
+            cumulative = 0
+            for bound, value in zip(LATENCY_BUCKETS, buckets):
+                cumulative += value
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {latency_sum}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {count}")
+
+        sections = [
+            ("db_queries_total", "counter", "Comandos SQL executados por endpoint.", 4),
+            ("db_query_duration_seconds_total", "counter", "Tempo total no banco por endpoint.", 5),
+            ("http_response_size_bytes_total", "counter", "Bytes enviados nas respostas por endpoint.", 6),
+        ]
+        for name, kind, description, index in sections:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            for values in endpoints:
+                method, endpoint = values[0]
+                lines.append(f"{name}{{{_labels(method=method, endpoint=endpoint)}}} {values[index]}")
+        return "\n".join(lines) + "\n"
+
+
+def instrument_engine(engine):
+    # Conta comandos e tempo de banco da requisição atual. O início fica no
+    # contexto do comando: um comando que falha não chama o after_cursor_execute
+    # e não deixa nada para trás na conexão do pool
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start
+        if not has_request_context() or 'sql_count' not in g:
+            return
+        g.sql_count += 1
+        g.sql_time += elapsed
+        if g.sql_statements is not None:
+            g.sql_statements.append((elapsed, statement))
+
+
+def init_metrics(app, engine):
+    metrics = Metrics()
+    app.extensions['metrics'] = metrics
+    instrument_engine(engine)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+        # Só guarda os comandos quando o log de requisições lentas está ativo
+        g.sql_statements = [] if app.config.get('SLOW_REQUEST_MS') is not None else None
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'request_start' not in g:
+            return response
+        duration = time.perf_counter() - g.request_start
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        size = response.content_length or 0  # Respostas em stream não têm tamanho
+        metrics.observe(request.method, endpoint, response.status_code,
+                        duration, g.sql_count, g.sql_time, size)
+        slow_request_ms = app.config.get('SLOW_REQUEST_MS')
+        if g.sql_statements is not None and duration * 1000 >= slow_request_ms:
+            statements = "\n".join(
+                f"  {elapsed * 1000:.2f} ms  {statement}" for elapsed, statement in g.sql_statements
+            )
+            app.logger.warning(
+                "Requisição lenta: %s %s levou %.1f ms (%d comandos SQL, %.1f ms no banco)\n%s",
+                request.method, request.full_path, duration * 1000,
+                g.sql_count, g.sql_time * 1000, statements,
+            )
+        return response
+
+    @app.route('/metrics')
+    def serve_metrics():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    return metrics
+
+
+def init_traffic_recorder(app, path):
+    # Grava as requisições de /tasks em JSONL, no formato lido por
+    # benchmarks/load_replay.py. Ids no caminho viram "{id}", pois não existem
+    # no banco em que o trace será reproduzido
+    lock = threading.Lock()
+    started = []
+
+    @app.after_request
+    def record_traffic(response):
+        if not request.path.startswith('/tasks') or request.path.endswith('/events'):
+            return response
+        now = time.time()
+        with lock:
+            if not started:
+                started.append(now)
+            entry = {
+                "at": round(now - started[0], 4),
+                "method": request.method,
+                "path": re.sub(r"/\d+(?=/|$)", "/{id}", request.path),
+                "query": request.query_string.decode(),
+                "json": request.get_json(silent=True),
+            }
+            with open(path, 'a', encoding='utf-8') as handle:
+                handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return response
@@ -0,0 +1,140 @@
+# Migrações versionadas pelo PRAGMA user_version do SQLite. Cada passo é
+# idempotente; bancos novos recebem o esquema completo no primeiro passo e os
+# demais só completam o que faltar em bancos antigos.
+from sqlalchemy import MetaData, inspect
+from sqlalchemy.schema import CreateTable
+
+from .schema import (install_archive_stats, install_search, install_stats,
+                     install_task_triggers, seed_categories)
+
+
+def _create_tables(connection, metadata):
+    metadata.create_all(connection)
+
+
+def _upgrade_legacy_task_table(connection, metadata):
+    # Bases anteriores guardavam a categoria como texto e não tinham versão
+    from .models import CATEGORY_CODES
+
+    columns = {column['name'] for column in inspect(connection).get_columns('task')}
+    if 'category_id' not in columns:
+        connection.exec_driver_sql(
+            "ALTER TABLE task ADD COLUMN category_id SMALLINT REFERENCES category(id)"
+        )
+        if 'category' in columns:
+            connection.exec_driver_sql(
+                "UPDATE task SET category_id = ? WHERE category = ?",
+                [(code, name) for name, code in CATEGORY_CODES.items()],
+            )
+    if 'updated_at' not in columns:
+        connection.exec_driver_sql("ALTER TABLE task ADD COLUMN updated_at DATETIME")
+        connection.exec_driver_sql("UPDATE task SET updated_at = created_at")
+    if 'version' not in columns:
+        connection.exec_driver_sql("ALTER TABLE task ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    if 'category' in columns and connection.dialect.dbapi.sqlite_version_info >= (3, 35):
+        connection.exec_driver_sql("ALTER TABLE task DROP COLUMN category")
+
+
+def _create_indexes(connection, metadata):
+    connection.exec_driver_sql("DROP INDEX IF EXISTS ix_task_completed_deadline_id")
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _install_categories(connection, metadata):
+    from .models import CATEGORIES
+
+    seed_categories(connection, CATEGORIES)
+
+
+def _install_search(connection, metadata):
+    install_search(connection)
+
+
+def _install_stats(connection, metadata):
+    install_stats(connection)
+
+
+def _create_archive(connection, metadata):
+    # Bancos anteriores ganham a tabela task_archive (create_all só cria o que falta)
+    metadata.create_all(connection)
+    install_archive_stats(connection)
+
+
+def _add_sync_reset(connection, metadata):
+    # Marco da última limpeza/retenção de tombstones (ver TaskManager.get_changes)
+    columns = {column['name'] for column in inspect(connection).get_columns('change_version')}
+    if 'reset_version' not in columns:
+        connection.exec_driver_sql(
+            "ALTER TABLE change_version ADD COLUMN reset_version INTEGER NOT NULL DEFAULT 0"
+        )
+
+
+def _autoincrement_task_ids(connection, metadata):
+    # Com AUTOINCREMENT o SQLite nunca reaproveita o id de uma tarefa removida
+    # ou arquivada. O SQLite não altera a chave de uma tabela existente: a
+    # tabela é recriada com os mesmos ids, índices e gatilhos
+    sql = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'task'"
+    ).scalar()
+    if 'AUTOINCREMENT' in sql.upper():
+        return
+    table = metadata.tables['task']
+    copy = MetaData()
+    metadata.tables['category'].to_metadata(copy)
+    rebuilt = table.to_metadata(copy, name='task_rebuild')
+    connection.execute(CreateTable(rebuilt))
+    columns = ", ".join(column.name for column in table.columns)
+    connection.exec_driver_sql(f"INSERT INTO task_rebuild ({columns}) SELECT {columns} FROM task")
+    # Remove também os índices e gatilhos da tabela antiga; o índice de busca
+    # (task_fts) e os contadores continuam válidos, pois ids e linhas são os mesmos
+    connection.exec_driver_sql("DROP TABLE task")
+    connection.exec_driver_sql("ALTER TABLE task_rebuild RENAME TO task")
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+    install_task_triggers(connection)
+    # Próximos ids acima de qualquer id já usado, inclusive os arquivados e removidos
+    connection.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'task'")
+    connection.exec_driver_sql("""
+        INSERT INTO sqlite_sequence(name, seq) SELECT 'task', max(
+            IFNULL((SELECT max(id) FROM task), 0),
+            IFNULL((SELECT max(id) FROM task_archive), 0),
+            IFNULL((SELECT max(task_id) FROM task_tombstone), 0)
+        )
+    """)
+
+
+MIGRATIONS = [
+    _create_tables,
+    _upgrade_legacy_task_table,
+    _create_indexes,
+    _install_categories,
+    _install_search,
+    _install_stats,
+    _create_archive,
+    _add_sync_reset,
+    _autoincrement_task_ids,
+]
+
+
+def schema_version(connection):
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(engine, metadata):
+    # Caminho rápido: uma leitura do cabeçalho quando o esquema está em dia
+    with engine.connect() as connection:
+        if schema_version(connection) >= len(MIGRATIONS):
+            return 0
+
+    with engine.begin() as connection:
+        # BEGIN IMMEDIATE trava a escrita: entre vários workers iniciando ao
+        # mesmo tempo, só um aplica os passos e os outros encontram tudo pronto
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        current = schema_version(connection)
+        for step in MIGRATIONS[current:]:
+            step(connection, metadata)
+        if current < len(MIGRATIONS):
+            connection.exec_driver_sql(f"PRAGMA user_version = {len(MIGRATIONS)}")
+        return max(0, len(MIGRATIONS) - current)
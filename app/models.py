@@ -1,13 +1,55 @@
 from app import db  
-from datetime import datetime
+from flask import current_app, has_app_context
+from .events import queue_event
+from datetime import datetime, timedelta
+import base64
+import functools
+import json
+import re
+
+# Categorias gravadas como códigos inteiros (tabela category); a ordem da
+# lista define o código e não deve mudar, apenas receber novos itens no fim
+CATEGORIES = ["Trabalho", "Pessoal", "Casa", "Saúde", "Finanças"]
+CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORIES, start=1)}
+CATEGORY_NAMES = {code: name for name, code in CATEGORY_CODES.items()}
+
+
+class Category(db.Model):
+    id = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+
 
 class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.Text)
-    category = db.Column(db.String(50))
+    category_id = db.Column(db.SmallInteger, db.ForeignKey('category.id'))
     deadline = db.Column(db.DateTime)
     completed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Versão global (ChangeVersion) da última alteração, usada na sincronização
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    # Índices para a paginação por cursor (keyset) em (deadline, id). O filtro
+    # por status usa um índice parcial para cada valor de completed: as
+    # consultas de pendentes não tocam nas concluídas, que crescem sem parar.
+    # AUTOINCREMENT: ids de tarefas removidas ou arquivadas não são reaproveitados
+    __table_args__ = (
+        db.Index('ix_task_deadline_id', 'deadline', 'id'),
+        db.Index('ix_task_pending_deadline', 'deadline', 'id', sqlite_where=db.text('completed = 0')),
+        db.Index('ix_task_completed_deadline', 'deadline', 'id', sqlite_where=db.text('completed = 1')),
+        db.Index('ix_task_version', 'version'),
+        db.Index('ix_task_category_completed_deadline', 'category_id', 'completed', 'deadline'),
+        {'sqlite_autoincrement': True},
+    )
+
+    @property
+    def category(self):
+        return CATEGORY_NAMES.get(self.category_id)
+
+    @category.setter
+    def category(self, name):
+        self.category_id = CATEGORY_CODES.get(name)
 
     def __repr__(self):
         return f"<Task {self.description}>"
@@ -22,52 +64,662 @@ class Task(db.Model):
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S"),
         }
 
+class TaskArchive(db.Model):
+    # Tarefas concluídas antigas, movidas por TaskManager.archive_completed para
+    # que a tabela task e seus índices fiquem só com as tarefas em uso
+    __tablename__ = 'task_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.Text)
+    category_id = db.Column(db.SmallInteger, db.ForeignKey('category.id'))
+    deadline = db.Column(db.DateTime)
+    completed = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_task_archive_deadline_id', 'deadline', 'id'),
+    )
+
+
+class ChangeVersion(db.Model):
+    # Versão global da tabela de tarefas, incrementada a cada alteração
+    __tablename__ = 'change_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    # Versões até esta não têm mais remoções registradas (limpeza total ou
+    # tombstones descartados): a sincronização a partir delas é completa
+    reset_version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class TaskTombstone(db.Model):
+    # Registro das tarefas removidas, para a sincronização incremental
+    __tablename__ = 'task_tombstone'
+    task_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, index=True)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class TaskCounter(db.Model):
+    # Resumo mantido por gatilhos (app/schema.py): quantidade de tarefas por
+    # categoria e status, para que as estatísticas não varram a tabela task
+    __tablename__ = 'task_counter'
+    category_id = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    completed = db.Column(db.Boolean, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Tabela virtual FTS5 criada em app/schema.py (fora do create_all)
+task_fts = db.table('task_fts', db.column('rowid'), db.column('rank'), db.column('task_fts'))
+
+
+def build_match_query(text):
+    # Cada termo vira uma frase entre aspas; "term*" mantém a busca por prefixo
+    terms = re.findall(r"\w+\*?", text or "")
+    if not terms:
+        raise ValueError("Consulta inválida")
+    return " ".join(
+        f'"{term[:-1]}"*' if term.endswith("*") else f'"{term}"' for term in terms
+    )
+
+
+def group_committed(method):
+    # Com GROUP_COMMIT ativo, a alteração é enfileirada para o escritor único
+    # e a chamada espera o commit do lote em que ela entrou
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        writer = None
+        if not self.deferred and has_app_context():
+            writer = current_app.extensions.get('group_commit')
+        if writer is None:
+            return method(self, *args, **kwargs)
+        return writer.submit(method.__name__, args, kwargs)
+    return wrapper
+
+
+def encode_cursor(deadline, task_id):
+    deadline = deadline.isoformat() if deadline else None
+    raw = json.dumps([deadline, task_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        deadline, task_id = json.loads(base64.urlsafe_b64decode(padded))
+        if deadline is not None:
+            deadline = datetime.fromisoformat(deadline)
+        if not isinstance(task_id, int):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+    return deadline, task_id
+
+
 class TaskManager:
-    CATEGORIES = ["Trabalho", "Pessoal", "Casa", "Saúde", "Finanças"]
+    CATEGORIES = CATEGORIES
+    FIELDS = ("id", "description", "category", "deadline", "completed", "created_at")
+    DEFAULT_PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 1000
+    MAX_BULK_IDS = 10000
+    # Tombstones mantidos para a sincronização incremental, em versões
+    TOMBSTONE_RETENTION = 100000
 
-    def __init__(self, db):
+    def __init__(self, db, deferred=False):
         self.db = db  # Injeta a instância do SQLAlchemy
+        # No modo adiado (usado pelo escritor de group commit) as alterações
+        # só são enviadas ao banco; o commit é feito pelo lote inteiro
+        self.deferred = deferred
+
+    def _commit(self):
+        if self.deferred:
+            self.db.session.flush()
+        else:
+            self.db.session.commit()
+
+    def current_version(self):
+        version = self.db.session.execute(
+            db.select(ChangeVersion.version).where(ChangeVersion.id == 1)
+        ).scalar()
+        return version or 0
+
+    def reset_version(self):
+        version = self.db.session.execute(
+            db.select(ChangeVersion.reset_version).where(ChangeVersion.id == 1)
+        ).scalar()
+        return version or 0
+
+    def _tombstone_retention(self):
+        if has_app_context():
+            return current_app.config.get('TOMBSTONE_RETENTION_VERSIONS', self.TOMBSTONE_RETENTION)
+        return self.TOMBSTONE_RETENTION
+
+    def _next_version(self):
+        # Subconsulta com o valor que _bump_version vai gravar nesta transação
+        table = ChangeVersion.__table__
+        return db.select(db.func.coalesce(db.func.max(table.c.version), 0) + 1).scalar_subquery()
+
+    def _bump_version(self):
+        # Executado dentro da mesma transação da alteração
+        table = ChangeVersion.__table__
+        statement = db.update(table).where(table.c.id == 1).values(version=table.c.version + 1)
+        if self._returning_supported():
+            version = self.db.session.execute(statement.returning(table.c.version)).scalar()
+        elif self.db.session.execute(statement).rowcount:
+            version = self.current_version()
+        else:
+            version = None
+        if version is None:
+            version = 1
+            self.db.session.execute(db.insert(table).values(id=1, version=version))
+        return version
+
+    def _record_deletions(self, version, ids):
+        table = TaskTombstone.__table__
+        now = datetime.utcnow()
+        if ids:
+            self.db.session.execute(db.insert(table).prefix_with('OR REPLACE'), [
+                {"task_id": task_id, "version": version, "deleted_at": now} for task_id in ids
+            ])
+        # Retenção: tombstones antigos são descartados e quem sincroniza a
+        # partir de uma versão anterior ao corte recebe a lista completa
+        cutoff = version - self._tombstone_retention()
+        if cutoff > 0:
+            pruned = self.db.session.execute(db.delete(table).where(table.c.version <= cutoff))
+            if pruned.rowcount:
+                self._reset_sync(cutoff)
+
+    def _reset_sync(self, version):
+        table = ChangeVersion.__table__
+        self.db.session.execute(
+            db.update(table).where(table.c.id == 1)
+            .values(reset_version=db.func.max(table.c.reset_version, version))
+        )
+
+    def _emit(self, event_type, version, **payload):
+        queue_event(self.db.session, {"type": event_type, "version": version, **payload})
+
+    @classmethod
+    def validate(cls, data):
+        # Retorna a mensagem de erro do item, ou None se for válido
+        if not isinstance(data, dict):
+            return "Tarefa inválida"
+        if not data.get('description'):
+            return "Description is required"
+        if data.get('category', 'General') not in cls.CATEGORIES:
+            return "Categoria inválida"
+        deadline = data.get('deadline')
+        if deadline:
+            try:
+                datetime.strptime(deadline, "%Y-%m-%d")
+            except (TypeError, ValueError):
+                return "Prazo inválido"
+        return None
 
+    @group_committed
     def add_task(self, description, category, deadline):
         deadline_datetime = datetime.strptime(deadline, "%Y-%m-%d")
-        new_task = Task(description=description, category=category, deadline=deadline_datetime)
+        version = self._bump_version()
+        new_task = Task(description=description, category=category,
+                        deadline=deadline_datetime, version=version)
         self.db.session.add(new_task)
-        self.db.session.commit()
-        return new_task.to_dict()
+        self.db.session.flush()
+        task = new_task.to_dict()
+        self._emit("created", version, task=task)
+        self._commit()
+        return task
+
+    @group_committed
+    def add_tasks(self, items, chunk_size=None):
+        # Valida todo o lote antes de inserir; itens inválidos são reportados
+        results = []
+        rows = []
+        now = datetime.utcnow()
+        for index, data in enumerate(items):
+            error = self.validate(data)
+            if error:
+                results.append({"index": index, "status": "error", "error": error})
+                continue
+            deadline = data.get('deadline')
+            rows.append({
+                "description": data['description'],
+                "category_id": CATEGORY_CODES[data['category']],
+                "deadline": datetime.strptime(deadline, "%Y-%m-%d") if deadline else None,
+                "completed": False,
+                "created_at": now,
+                "updated_at": now,
+            })
+            results.append({"index": index, "status": "created", "row": rows[-1]})
+
+        # Um único INSERT executemany por transação (ou por bloco, se configurado)
+        table = Task.__table__
+        returning = self._returning_supported()
+        chunk_size = chunk_size or len(rows) or 1
+        created = iter(result for result in results if "row" in result)
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            version = self._bump_version()
+            for row in chunk:
+                row["version"] = version
+            if returning:
+                ids = self.db.session.execute(
+                    db.insert(table).returning(table.c.id, sort_by_parameter_order=True), chunk
+                ).scalars().all()
+            else:
+                # Sem RETURNING, um INSERT por linha para obter o id gerado
+                ids = [self.db.session.execute(db.insert(table), row).inserted_primary_key[0]
+                       for row in chunk]
+            for task_id, row in zip(ids, chunk):
+                result = next(created)
+                del result["row"]
+                result["task"] = Task(id=task_id, **row).to_dict()
+                self._emit("created", version, task=result["task"])
+            self._commit()
+        return results
+
+    def _returning_supported(self):
+        # INSERT/UPDATE/DELETE ... RETURNING só existe a partir do SQLite 3.35;
+        # o dialeto desliga as flags ao conectar em versões anteriores
+        dialect = self.db.session.get_bind().dialect
+        return dialect.insert_returning and dialect.update_returning and dialect.delete_returning
+
+    def _update_task(self, task_id, **values):
+        # Altera uma tarefa em um único UPDATE e devolve a linha já no formato
+        # de Task.to_dict, sem carregar o objeto do ORM antes
+        table = Task.__table__
+        columns = self._field_columns()
+        statement = (
+            db.update(table)
+            .where(table.c.id == task_id)
+            .values(version=self._next_version(), updated_at=datetime.utcnow(), **values)
+        )
+        select_columns = [columns[name].label(name) for name in self.FIELDS]
+        if self._returning_supported():
+            row = self.db.session.execute(statement.returning(*select_columns)).first()
+        else:
+            # SQLite antigo: o UPDATE já segura o lock de escrita, então a
+            # leitura seguinte na mesma transação vê a linha alterada
+            row = None
+            if self.db.session.execute(statement).rowcount:
+                row = self.db.session.execute(
+                    db.select(*select_columns).where(table.c.id == task_id)
+                ).first()
+        if row is None:
+            return None
+        task = dict(zip(self.FIELDS, row))
+        version = self._bump_version()
+        self._emit("updated", version, task=task)
+        self._commit()
+        return task
 
+    @group_committed
     def edit_task(self, task_id, description=None, category=None, deadline=None):
-        task = Task.query.get(task_id)
-        if task:
-            if description:
-                task.description = description
-            if category and category in self.CATEGORIES:
-                task.category = category
-            if deadline:
-                deadline_datetime = datetime.strptime(deadline, "%Y-%m-%d")
-                task.deadline = deadline_datetime
-            self.db.session.commit()
-            return task
-        return None
+        values = {}
+        if description:
+            values["description"] = description
+        if category and category in self.CATEGORIES:
+            values["category_id"] = CATEGORY_CODES[category]
+        if deadline:
+            values["deadline"] = datetime.strptime(deadline, "%Y-%m-%d")
+        return self._update_task(task_id, **values)
 
+    @group_committed
     def delete_task(self, task_id):
-        task = Task.query.get(task_id)
-        if task:
-            self.db.session.delete(task)
-            self.db.session.commit()
+        # Retorna se alguma tarefa foi de fato removida
+        table = Task.__table__
+        statement = db.delete(table).where(table.c.id == task_id)
+        if self._returning_supported():
+            deleted = self.db.session.execute(statement.returning(table.c.id)).first() is not None
+        else:
+            deleted = self.db.session.execute(statement).rowcount > 0
+        if not deleted:
+            return False
+        version = self._bump_version()
+        self._record_deletions(version, [task_id])
+        self._emit("deleted", version, id=task_id)
+        self._commit()
+        return True
 
+    @group_committed
     def mark_completed(self, task_id):
-        task = Task.query.get(task_id)
-        if task:
-            task.completed = True
-            self.db.session.commit()
-        return task
+        return self._update_task(task_id, completed=True)
+
+    def _bulk_filter(self, ids=None, category=None, deadline_before=None):
+        # Monta o WHERE das operações em massa; exige ao menos um critério
+        table = Task.__table__
+        clauses = []
+        if ids is not None:
+            if (not isinstance(ids, list) or len(ids) > self.MAX_BULK_IDS
+                    or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+                raise ValueError("Lista de ids inválida")
+            clauses.append(table.c.id.in_(ids))
+        if category is not None:
+            if category not in self.CATEGORIES:
+                raise ValueError("Categoria inválida")
+            clauses.append(table.c.category_id == CATEGORY_CODES[category])
+        if deadline_before is not None:
+            try:
+                deadline = datetime.strptime(deadline_before, "%Y-%m-%d")
+            except (TypeError, ValueError):
+                raise ValueError("Prazo inválido")
+            clauses.append(table.c.deadline < deadline)
+        if not clauses:
+            raise ValueError("Informe ids ou um filtro")
+        return clauses
+
+    @group_committed
+    def complete_tasks(self, ids=None, category=None, deadline_before=None):
+        table = Task.__table__
+        clauses = self._bulk_filter(ids, category, deadline_before)
+        columns = self._field_columns()
+        # Um único UPDATE ... RETURNING, sem carregar objetos do ORM; a versão
+        # só é incrementada (para o mesmo valor) se alguma linha mudou
+        select_columns = [columns[name].label(name) for name in self.FIELDS]
+        statement = (
+            db.update(table)
+            .where(*clauses, table.c.completed == db.false())
+            .values(completed=True, version=self._next_version(), updated_at=datetime.utcnow())
+        )
+        if self._returning_supported():
+            rows = self.db.session.execute(statement.returning(*select_columns))
+        else:
+            # As linhas alteradas são as que receberam a versão ainda não
+            # gravada em change_version, exclusiva desta operação
+            self.db.session.execute(statement)
+            rows = self.db.session.execute(
+                db.select(*select_columns).where(table.c.version == self._next_version())
+            )
+        tasks = [dict(zip(self.FIELDS, row)) for row in rows]
+        if not tasks:
+            return []
+        version = self._bump_version()
+        for task in tasks:
+            self._emit("updated", version, task=task)
+        self._commit()
+        return sorted(task["id"] for task in tasks)
+
+    @group_committed
+    def delete_tasks(self, ids=None, category=None, deadline_before=None):
+        table = Task.__table__
+        clauses = self._bulk_filter(ids, category, deadline_before)
+        if self._returning_supported():
+            deleted_ids = self.db.session.execute(
+                db.delete(table).where(*clauses).returning(table.c.id)
+            ).scalars().all()
+        else:
+            # Sem RETURNING: ids lidos antes do DELETE, na mesma transação
+            deleted_ids = self.db.session.execute(db.select(table.c.id).where(*clauses)).scalars().all()
+            if deleted_ids:
+                self.db.session.execute(db.delete(table).where(table.c.id.in_(deleted_ids)))
+        if not deleted_ids:
+            return []
+        version = self._bump_version()
+        self._record_deletions(version, deleted_ids)
+        for task_id in deleted_ids:
+            self._emit("deleted", version, id=task_id)
+        self._commit()
+        return sorted(deleted_ids)
 
     def get_tasks(self, completed=None):
         query = Task.query
         if completed is not None:
             query = query.filter_by(completed=completed)
-        return query.order_by(Task.deadline.nulls_first(), Task.deadline).all()
-    
+        return query.order_by(Task.deadline.nulls_first(), Task.id).all()
+
+    @classmethod
+    def parse_fields(cls, fields):
+        # Converte "?fields=id,description" na tupla de campos pedidos
+        if not fields:
+            return cls.FIELDS
+        names = tuple(name.strip() for name in fields.split(',') if name.strip())
+        if not names or any(name not in cls.FIELDS for name in names):
+            raise ValueError("Campos inválidos")
+        return names
+
+    def _field_columns(self, table=None):
+        # Colunas via Core, com as datas já formatadas pelo SQLite no mesmo
+        # formato de Task.to_dict
+        table = Task.__table__ if table is None else table
+        return {
+            "id": table.c.id,
+            "description": table.c.description,
+            "category": db.case(CATEGORY_NAMES, value=table.c.category_id),
+            "deadline": db.func.strftime('%Y-%m-%d', table.c.deadline),
+            "completed": table.c.completed,
+            "created_at": db.func.strftime('%Y-%m-%d %H:%M:%S', table.c.created_at),
+        }
+
+    @classmethod
+    def parse_categories(cls, values):
+        # Aceita "?category=Casa&category=Pessoal" ou "?category=Casa,Pessoal"
+        names = [name.strip() for value in values for name in value.split(',') if name.strip()]
+        if any(name not in cls.CATEGORIES for name in names):
+            raise ValueError("Categoria inválida")
+        return names or None
+
+    @classmethod
+    def parse_date(cls, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            raise ValueError("Prazo inválido")
+
+    def _select_rows(self, fields, with_keys=False, include_archived=False, after=None,
+                     **filters):
+        # Com include_archived, une as tarefas arquivadas (todas concluídas)
+        tables = [Task.__table__]
+        if include_archived and filters.get('completed') is not False:
+            tables.append(TaskArchive.__table__)
+            with_keys = True  # a ordenação da união usa as colunas-chave
+        parts = [self._filter_rows(table, fields, with_keys, after, **filters) for table in tables]
+        if len(parts) == 1:
+            table = tables[0]
+            return parts[0].order_by(table.c.deadline.nulls_first(), table.c.id)
+        return db.union_all(*parts).order_by(db.column('_deadline').nulls_first(), db.column('_id'))
+
+    def _filter_rows(self, table, fields, with_keys=False, after=None, completed=None,
+                     categories=None, due_before=None, due_after=None):
+        columns = self._field_columns(table)
+        selected = [columns[name].label(name) for name in fields]
+        if with_keys:
+            selected += [table.c.deadline.label('_deadline'), table.c.id.label('_id')]
+        statement = db.select(*selected)
+        if completed is not None:
+            statement = statement.where(table.c.completed == completed)
+        if categories:
+            # Usa o índice (category_id, completed, deadline)
+            codes = sorted({CATEGORY_CODES[name] for name in categories})
+            if len(codes) == 1:
+                statement = statement.where(table.c.category_id == codes[0])
+            else:
+                statement = statement.where(table.c.category_id.in_(codes))
+        # Limites exclusivos: prazo < due_before e prazo > due_after
+        if due_before is not None:
+            statement = statement.where(table.c.deadline < due_before)
+        if due_after is not None:
+            statement = statement.where(table.c.deadline > due_after)
+        if after is not None:
+            # Continua a partir da última linha vista, sem OFFSET
+            deadline, task_id = after
+            if deadline is None:
+                statement = statement.where(db.or_(
+                    db.and_(table.c.deadline.is_(None), table.c.id > task_id),
+                    table.c.deadline.isnot(None),
+                ))
+            else:
+                statement = statement.where(
+                    db.tuple_(table.c.deadline, table.c.id) > db.tuple_(deadline, task_id)
+                )
+        return statement
+
+    def iter_tasks(self, fields=None, batch_size=500, **filters):
+        # Percorre a consulta em lotes no servidor, sem materializar tudo
+        fields = fields or self.FIELDS
+        statement = self._select_rows(fields, **filters)
+        result = self.db.session.execute(statement.execution_options(yield_per=batch_size))
+        for row in result:
+            yield dict(zip(fields, row))
+
+    def get_task_rows(self, fields=None, limit=None, cursor=None, **filters):
+        # Listagem sem hidratar objetos do ORM; com limit/cursor, pagina por
+        # (deadline, id) e retorna também o cursor da próxima página
+        fields = fields or self.FIELDS
+        if limit is None and cursor is None:
+            result = self.db.session.execute(self._select_rows(fields, **filters))
+            return [dict(zip(fields, row)) for row in result], None
+
+        limit = min(limit or self.DEFAULT_PAGE_SIZE, self.MAX_PAGE_SIZE)
+        after = decode_cursor(cursor) if cursor else None
+        statement = self._select_rows(fields, with_keys=True, after=after, **filters)
+        # Busca uma linha a mais para saber se existe próxima página
+        rows = self.db.session.execute(statement.limit(limit + 1)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]._deadline, rows[-1]._id)
+        size = len(fields)
+        return [dict(zip(fields, row[:size])) for row in rows], next_cursor
+
+    def search_tasks(self, text, completed=None, category=None, fields=None,
+                     limit=None, offset=0):
+        # Busca textual ordenada por relevância (bm25) usando o índice FTS5
+        fields = fields or self.FIELDS
+        limit = min(limit or self.DEFAULT_PAGE_SIZE, self.MAX_PAGE_SIZE)
+        table = Task.__table__
+        columns = self._field_columns()
+        statement = (
+            db.select(*(columns[name].label(name) for name in fields))
+            .select_from(task_fts.join(table, table.c.id == task_fts.c.rowid))
+            .where(task_fts.c.task_fts.op('MATCH')(build_match_query(text)))
+            .order_by(task_fts.c.rank, table.c.id)
+        )
+        if completed is not None:
+            statement = statement.where(table.c.completed == completed)
+        if category is not None:
+            statement = statement.where(table.c.category_id == CATEGORY_CODES[category])
+        rows = self.db.session.execute(statement.limit(limit + 1).offset(offset)).all()
+        next_offset = offset + limit if len(rows) > limit else None
+        return [dict(zip(fields, row)) for row in rows[:limit]], next_offset
+
+    def get_changes(self, since, fields=None):
+        # Sincronização incremental: tarefas alteradas e ids removidos depois
+        # da versão informada, ambos servidos pelos índices de versão. Se as
+        # remoções dessa versão já não estão registradas (limpeza ou retenção),
+        # a resposta traz todas as tarefas com "resync" e o cliente substitui
+        # a lista local
+        fields = fields or self.FIELDS
+        state = self.db.session.execute(
+            db.select(ChangeVersion.version, ChangeVersion.reset_version).where(ChangeVersion.id == 1)
+        ).first()
+        version, reset_version = state or (0, 0)
+        resync = since < reset_version
+        table = Task.__table__
+        columns = self._field_columns()
+        statement = (
+            db.select(*(columns[name].label(name) for name in fields), table.c.id.label('_id'))
+            .order_by(table.c.version, table.c.id)
+        )
+        if not resync:
+            statement = statement.where(table.c.version > since)
+        rows = self.db.session.execute(statement).all()
+        size = len(fields)
+        changed_ids = {row._id for row in rows}
+
+        deleted = []
+        if not resync:
+            tombstones = TaskTombstone.__table__
+            deleted = self.db.session.execute(
+                db.select(tombstones.c.task_id)
+                .where(tombstones.c.version > since)
+                .order_by(tombstones.c.version, tombstones.c.task_id)
+            ).scalars().all()
+        return {
+            "version": version,
+            "resync": resync,
+            "tasks": [dict(zip(fields, row[:size])) for row in rows],
+            # Um id reaproveitado por uma tarefa nova aparece só em "tasks"
+            "deleted": [task_id for task_id in deleted if task_id not in changed_ids],
+        }
+
+    def get_stats(self, today=None):
+        today = today or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        end_of_week = today + timedelta(days=7 - today.weekday())
+
+        by_category = {category: {"pending": 0, "completed": 0} for category in self.CATEGORIES}
+        for category_id, completed, count in self.db.session.execute(
+            db.select(TaskCounter.category_id, TaskCounter.completed, TaskCounter.count)
+        ):
+            status = "completed" if completed else "pending"
+            category = CATEGORY_NAMES.get(category_id, "")
+            by_category.setdefault(category, {"pending": 0, "completed": 0})[status] = count
+
+        # Contagens por prazo dependem da data atual e não podem ser mantidas
+        # como contadores; usam o índice (completed, deadline) só nas pendentes
+        table = Task.__table__
+        pending_due = db.select(db.func.count()).where(table.c.completed == db.false())
+        overdue = self.db.session.execute(
+            pending_due.where(table.c.deadline < today)
+        ).scalar()
+        due_this_week = self.db.session.execute(
+            pending_due.where(table.c.deadline >= today, table.c.deadline < end_of_week)
+        ).scalar()
+
+        pending = sum(counts["pending"] for counts in by_category.values())
+        completed = sum(counts["completed"] for counts in by_category.values())
+        return {
+            "by_category": by_category,
+            "pending": pending,
+            "completed": completed,
+            "total": pending + completed,
+            "overdue": overdue,
+            "due_this_week": due_this_week,
+        }
+
+    def archive_completed(self, older_than_days=30, chunk_size=500, now=None):
+        # Move para task_archive as tarefas concluídas sem alteração há mais de
+        # older_than_days dias, em transações de até chunk_size tarefas para não
+        # segurar o lock de escrita. Retorna quantas foram arquivadas
+        cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+        table = Task.__table__
+        archive = TaskArchive.__table__
+        names = [column.name for column in table.columns]
+        candidates = (
+            db.select(table.c.id)
+            .where(table.c.completed == db.true(), table.c.updated_at < cutoff)
+            .order_by(table.c.id)
+            .limit(chunk_size)
+        )
+        archived = 0
+        while True:
+            ids = self.db.session.execute(candidates).scalars().all()
+            if not ids:
+                break
+            now_archived = datetime.utcnow()
+            self.db.session.execute(archive.insert().from_select(
+                names + ['archived_at'],
+                db.select(*(table.c[name] for name in names), db.literal(now_archived))
+                .where(table.c.id.in_(ids)),
+            ))
+            self.db.session.execute(db.delete(table).where(table.c.id.in_(ids)))
+            # Para a sincronização incremental, saem da lista como remoções
+            version = self._bump_version()
+            self._record_deletions(version, ids)
+            self._emit("archived", version, ids=ids)
+            self._commit()
+            archived += len(ids)
+        return archived
+
+    @group_committed
     def delete_all(self):
+        version = self._bump_version()
         self.db.session.query(Task).delete()
-        self.db.session.commit()
\ No newline at end of file
+        self.db.session.execute(db.delete(TaskArchive.__table__))
+        # Uma limpeza não gera um tombstone por tarefa: fica registrada como
+        # um marco, e clientes de versões anteriores sincronizam do zero
+        self.db.session.execute(db.delete(TaskTombstone.__table__))
+        self._reset_sync(version)
+        self._emit("cleared", version)
+        self._commit()
\ No newline at end of file
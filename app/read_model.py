@@ -0,0 +1,253 @@
+# Modelo de leitura em memória: espelho das tarefas do banco principal,
+# ordenado por (prazo, id) com as tarefas sem prazo primeiro, como a API. É
+# carregado na inicialização e atualizado pelos eventos publicados após cada
+# commit; em cada leitura a versão global do banco é comparada com a do
+# modelo, e alterações feitas por outros processos são buscadas pelo delta
+# (versão das tarefas e tombstones).
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+
+from flask import current_app, has_app_context
+
+from .models import Task, TaskManager, TaskTombstone, decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Chave de ordenação: prazo "YYYY-MM-DD" ou "" (sem prazo vem antes)
+NO_DEADLINE = ""
+
+
+class TaskRecord:
+    __slots__ = ('id', 'description', 'category', 'deadline', 'completed',
+                 'created_at', 'version', 'key')
+
+    def __init__(self, task, version):
+        self.id = task["id"]
+        self.description = task["description"]
+        self.category = task["category"]
+        self.deadline = task["deadline"]
+        self.completed = bool(task["completed"])
+        self.created_at = task["created_at"]
+        self.version = version
+        self.key = (self.deadline or NO_DEADLINE, self.id)
+
+
+class ReadModel:
+    FIELDS = ("id", "description", "category", "deadline", "completed", "created_at")
+
+    def __init__(self, app=None, verify_seconds=60):
+        # Com app, só os commits feitos nele são aplicados: o broker é global
+        # e outros apps do processo podem usar outro banco
+        self.app = app
+        # Versão até a qual todas as alterações já estão no modelo, sem
+        # lacunas: eventos de commits deste processo só a avançam quando são
+        # a versão seguinte; as de outros processos vêm do _catch_up
+        self.version = 0
+        # Maior versão lida do próprio banco (carga, alcance e sync); só uma
+        # queda abaixo dela indica que o banco foi trocado ou restaurado
+        self._db_version = 0
+        self.verify_seconds = verify_seconds
+        self._verified_at = time.monotonic()
+        self._records = {}
+        # Listas de chaves ordenadas de cada visão, para busca binária
+        self._views = {None: [], False: [], True: []}
+        self._stale = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._records)
+
+    # ---------------------------- Atualização ----------------------------
+
+    def load(self, manager):
+        # Versão e tarefas lidas na mesma transação (mesmo snapshot)
+        with self._lock:
+            version = manager.current_version()
+            statement = manager._select_rows(self.FIELDS).add_columns(Task.__table__.c.version)
+            rows = manager.db.session.execute(statement).all()
+            self._records = {}
+            self._views = {None: [], False: [], True: []}
+            for row in rows:
+                record = TaskRecord(dict(zip(self.FIELDS, row)), row.version)
+                self._records[record.id] = record
+                # As linhas já chegam na ordem da visão
+                self._views[None].append(record.key)
+                self._views[record.completed].append(record.key)
+            self.version = version
+            self._db_version = version
+            self._stale = False
+            self._verified_at = time.monotonic()
+
+    def _insert(self, record):
+        self._records[record.id] = record
+        insort(self._views[None], record.key)
+        insort(self._views[record.completed], record.key)
+
+    def _remove(self, record):
+        del self._records[record.id]
+        for view in (self._views[None], self._views[record.completed]):
+            del view[bisect_left(view, record.key)]
+
+    def _upsert(self, task, version):
+        current = self._records.get(task["id"])
+        if current is not None:
+            if current.version > version:
+                return  # evento atrasado de uma versão já aplicada
+            self._remove(current)
+        self._insert(TaskRecord(task, version))
+
+    def _delete(self, task_id, version):
+        current = self._records.get(task_id)
+        if current is not None and current.version <= version:
+            self._remove(current)
+
+    def apply(self, events):
+        # Chamado pelo broker, na thread que fez o commit. Uma falha aqui não
+        # pode afetar a escrita já confirmada: o modelo é recarregado depois
+        if self.app is not None and has_app_context() and current_app._get_current_object() is not self.app:
+            return
+        try:
+            self._apply(events)
+        except Exception:
+            logger.exception("Falha ao aplicar eventos no modelo de leitura")
+            self._stale = True
+
+    def _apply(self, events):
+        with self._lock:
+            for event in events:
+                version = event.get("version", 0)
+                if event["type"] in ("created", "updated"):
+                    self._upsert(event["task"], version)
+                elif event["type"] == "deleted":
+                    self._delete(event["id"], version)
+                elif event["type"] == "archived":
+                    for task_id in event["ids"]:
+                        self._delete(task_id, version)
+                elif event["type"] == "cleared":
+                    for record in list(self._records.values()):
+                        if record.version <= version:
+                            self._remove(record)
+                # Uma lacuna (commit de outro worker ainda não lido) segura a
+                # versão: o próximo sync busca o delta a partir dela, e reaplicar
+                # as linhas deste evento é inofensivo pela versão de cada uma
+                if version == self.version + 1:
+                    self.version = version
+
+    def sync(self, manager, version):
+        # Garante que o modelo reflete a versão lida do banco nesta requisição
+        with self._lock:
+            if self._stale:
+                self.load(manager)
+            elif version < self._db_version and manager.current_version() < self._db_version:
+                # O banco voltou para trás (foi trocado ou restaurado)
+                logger.warning("Banco abaixo da versão já lida pelo modelo de leitura (%d < %d); recarregando",
+                               version, self._db_version)
+                self.load(manager)
+            elif version > self.version:
+                self._catch_up(manager, version)
+            # Versão menor que a do modelo, mas não que a do banco: a requisição
+            # leu a versão antes de um commit concorrente deste processo, já
+            # aplicado pelo evento. O modelo está em dia
+            self._db_version = max(self._db_version, version)
+            if self.verify_seconds is not None and \
+                    time.monotonic() - self._verified_at >= self.verify_seconds:
+                self._verify(manager)
+
+    def _catch_up(self, manager, version):
+        # Alterações de outros processos, pelo mesmo delta da sincronização
+        # incremental, com a versão de cada linha para descartar o que já é antigo
+        since = self.version
+        if since < manager.reset_version():
+            # Remoções anteriores já descartadas (limpeza ou retenção)
+            self.load(manager)
+            return
+        table = Task.__table__
+        tombstones = TaskTombstone.__table__
+        columns = manager._field_columns()
+        rows = manager.db.session.execute(
+            manager.db.select(*(columns[name].label(name) for name in self.FIELDS), table.c.version)
+            .where(table.c.version > since)
+        ).all()
+        deleted = manager.db.session.execute(
+            manager.db.select(tombstones.c.task_id, tombstones.c.version)
+            .where(tombstones.c.version > since)
+        ).all()
+        changed = {row.id for row in rows}
+        for task_id, task_version in deleted:
+            if task_id not in changed:
+                self._delete(task_id, task_version)
+        for row in rows:
+            self._upsert(dict(zip(self.FIELDS, row)), row.version)
+        self.version = max(self.version, version)
+        self._db_version = max(self._db_version, version)
+
+    def _verify(self, manager):
+        # Verificação periódica: por status, a quantidade, a soma e a maior
+        # versão das tarefas devem bater com o banco. Toda alteração grava uma
+        # versão nova na linha, então uma edição perdida também é detectada
+        version = manager.current_version()
+        if version > self.version:
+            self._catch_up(manager, version)
+        table = Task.__table__
+        func = manager.db.func
+        expected = {False: (0, 0, 0), True: (0, 0, 0)}
+        for completed, count, total, highest in manager.db.session.execute(
+            manager.db.select(table.c.completed, func.count(), func.coalesce(func.sum(table.c.version), 0),
+                              func.coalesce(func.max(table.c.version), 0))
+            .group_by(table.c.completed)
+        ):
+            previous = expected[bool(completed)]
+            expected[bool(completed)] = (previous[0] + count, previous[1] + total, max(previous[2], highest))
+        actual = {}
+        for status in (False, True):
+            versions = [self._records[key[1]].version for key in self._views[status]]
+            actual[status] = (len(versions), sum(versions), max(versions, default=0))
+        if actual != expected:
+            logger.warning("Modelo de leitura divergente do banco (%s != %s); recarregando",
+                           actual, expected)
+            self.load(manager)
+        self._verified_at = time.monotonic()
+
+    # ------------------------------ Leitura ------------------------------
+
+    def get_task_rows(self, fields=None, limit=None, cursor=None, completed=None,
+                      categories=None, due_before=None, due_after=None, include_archived=False):
+        # Mesmo contrato de TaskManager.get_task_rows: (tarefas, próximo cursor).
+        # Arquivadas não ficam em memória; essas listagens usam o banco
+        fields = fields or self.FIELDS
+        paginate = limit is not None or cursor is not None
+        if paginate:
+            limit = min(limit or TaskManager.DEFAULT_PAGE_SIZE, TaskManager.MAX_PAGE_SIZE)
+        with self._lock:
+            keys = self._views[completed]
+            start, end = 0, len(keys)
+            # Prazo nulo nunca satisfaz "prazo < x" nem "prazo > x"
+            if due_before is not None or due_after is not None:
+                start = bisect_right(keys, (NO_DEADLINE, float('inf')))
+            if due_after is not None:
+                start = max(start, bisect_right(keys, (due_after.strftime("%Y-%m-%d"), float('inf'))))
+            if due_before is not None:
+                end = bisect_left(keys, (due_before.strftime("%Y-%m-%d"),))
+            if cursor:
+                deadline, task_id = decode_cursor(cursor)
+                deadline = deadline.strftime("%Y-%m-%d") if deadline else NO_DEADLINE
+                start = max(start, bisect_right(keys, (deadline, task_id)))
+
+            selected = []
+            for index in range(start, end):
+                record = self._records[keys[index][1]]
+                if categories and record.category not in categories:
+                    continue
+                selected.append(record)
+                if paginate and len(selected) > limit:
+                    break
+            next_cursor = None
+            if paginate and len(selected) > limit:
+                selected = selected[:limit]
+                last = selected[-1]
+                last_deadline = datetime.strptime(last.deadline, "%Y-%m-%d") if last.deadline else None
+                next_cursor = encode_cursor(last_deadline, last.id)
+            return [{name: getattr(record, name) for name in fields} for record in selected], next_cursor
@@ -0,0 +1,101 @@
+# Repasse de eventos entre processos. Cada worker do gunicorn tem o próprio
+# broker, então uma alteração feita em outro worker só chega aos assinantes
+# SSE deste pelo banco: uma thread compara periodicamente a versão global de
+# cada canal com assinantes e publica o delta, com as mesmas consultas da
+# sincronização incremental (versão das tarefas e tombstones).
+import atexit
+import logging
+import threading
+
+from .models import Task, TaskManager, TaskTombstone
+from .tenants import use_tenant
+
+logger = logging.getLogger(__name__)
+
+
+class EventRelay:
+    FIELDS = TaskManager.FIELDS
+
+    def __init__(self, app, db, broker, interval=1.0):
+        self.app = app
+        self.db = db
+        self.broker = broker
+        self.interval = interval
+        self._seen = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # Iniciado sob demanda, para que a thread exista só depois do fork
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='event-relay', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.interval * 2)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        channels = set(self.broker.channels())
+        # Canais sem assinantes recomeçam da versão atual quando voltarem
+        for channel in set(self._seen) - channels:
+            del self._seen[channel]
+        for channel in channels:
+            try:
+                with self.app.app_context(), use_tenant(channel):
+                    try:
+                        events = self._changes(channel)
+                    finally:
+                        self.db.session.remove()
+            except Exception:
+                logger.exception("Falha ao repassar eventos do canal %s", channel)
+                continue
+            if events:
+                self.broker.broadcast(events, channel)
+
+    def _changes(self, channel):
+        manager = TaskManager(self.db)
+        version = manager.current_version()
+        since = self._seen.get(channel)
+        self._seen[channel] = version
+        if since is None or version <= since:
+            return []
+        if since < manager.reset_version():
+            # Limpeza ou tombstones descartados: o cliente recarrega a lista
+            return [{"type": "resync", "version": version}]
+
+        table = Task.__table__
+        tombstones = TaskTombstone.__table__
+        columns = manager._field_columns()
+        rows = self.db.session.execute(
+            self.db.select(*(columns[name].label(name) for name in self.FIELDS), table.c.version)
+            .where(table.c.version > since)
+            .order_by(table.c.version, table.c.id)
+        ).all()
+        deleted = self.db.session.execute(
+            self.db.select(tombstones.c.task_id, tombstones.c.version)
+            .where(tombstones.c.version > since)
+            .order_by(tombstones.c.version, tombstones.c.task_id)
+        ).all()
+        changed = {row.id for row in rows}
+        events = [
+            {"type": "deleted", "version": task_version, "id": task_id}
+            for task_id, task_version in deleted
+            if task_id not in changed and not self.broker.published_locally(channel, task_version)
+        ]
+        events.extend(
+            {"type": "updated", "version": row.version, "task": dict(zip(self.FIELDS, row))}
+            for row in rows if not self.broker.published_locally(channel, row.version)
+        )
+        return events
@@ -1,5 +1,11 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from datetime import datetime
+import hashlib
+import json
+import queue
+from .events import broker
 from .models import TaskManager
+from .tenants import current_tenant
 from app import db
 
 task_bp = Blueprint('tasks', __name__)
@@ -7,12 +13,188 @@ task_bp = Blueprint('tasks', __name__)
 @task_bp.route('/', methods=['GET'])
 def list_tasks():
     task_manager = TaskManager(db)
+
+    # ETag a partir da versão global e dos filtros: evita consultar a tabela de
+    # tarefas quando nada mudou desde a última leitura do cliente. A versão é
+    # por banco, então o tenant também entra no cálculo. O filtro overdue
+    # depende do dia atual: a data entra na chave e o ETag expira à meia-noite
+    filters = sorted(request.args.items(multi=True))
+    if request.args.get('overdue', '').lower() == 'true':
+        filters.append(("today", datetime.now().strftime("%Y-%m-%d")))
+    version = task_manager.current_version()
+    etag = hashlib.sha1(
+        json.dumps([current_tenant.get(), version, filters]).encode()
+    ).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response, status = _list_tasks(task_manager, version)
+        if status != 200:
+            return response, status
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _list_filters():
+    # Filtros comuns à listagem e à exportação
     completed = request.args.get('completed')
     if completed is not None:
         completed = completed.lower() == 'true'
-    tasks = task_manager.get_tasks(completed=completed)
-    task_list = [task.to_dict() for task in tasks]
-    return jsonify(task_list), 200
+    filters = {
+        "completed": completed,
+        "categories": TaskManager.parse_categories(request.args.getlist('category')),
+        "due_before": TaskManager.parse_date(request.args.get('due_before')),
+        "due_after": TaskManager.parse_date(request.args.get('due_after')),
+        "include_archived": request.args.get('include_archived', '').lower() == 'true',
+    }
+    if request.args.get('overdue', '').lower() == 'true':
+        # Atrasadas: pendentes com prazo anterior a hoje
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        filters["completed"] = False
+        filters["due_before"] = min(filters["due_before"] or today, today)
+    return filters
+
+def _row_source(task_manager, version, filters):
+    # Listagens do banco principal sem tarefas arquivadas podem vir do modelo
+    # de leitura em memória, sincronizado com a versão lida para o ETag
+    read_model = current_app.extensions.get('read_model')
+    if read_model is None or current_tenant.get() is not None or filters['include_archived']:
+        return task_manager
+    read_model.sync(task_manager, version)
+    return read_model
+
+def _list_tasks(task_manager, version):
+    try:
+        fields = TaskManager.parse_fields(request.args.get('fields'))
+        filters = _list_filters()
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    since = request.args.get('since')
+    if since is not None:
+        # Sincronização incremental a partir de uma versão conhecida
+        try:
+            since = int(since)
+        except ValueError:
+            return jsonify({"error": "Versão inválida"}), 400
+        return jsonify(task_manager.get_changes(since, fields=fields)), 200
+
+    source = _row_source(task_manager, version, filters)
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    if limit is None and cursor is None:
+        task_list, _ = source.get_task_rows(fields=fields, **filters)
+        return jsonify(task_list), 200
+
+    # Paginação por cursor: resposta com a página e o cursor da próxima
+    try:
+        limit = int(limit) if limit is not None else None
+        if limit is not None and limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "Limite inválido"}), 400
+    try:
+        task_list, next_cursor = source.get_task_rows(
+            fields=fields, limit=limit, cursor=cursor, **filters
+        )
+    except ValueError:
+        return jsonify({"error": "Cursor inválido"}), 400
+    return jsonify({"tasks": task_list, "next_cursor": next_cursor}), 200
+
+@task_bp.route('/export', methods=['GET'])
+def export_tasks():
+    task_manager = TaskManager(db)
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'json'):
+        return jsonify({"error": "Formato inválido"}), 400
+    try:
+        fields = TaskManager.parse_fields(request.args.get('fields'))
+        filters = _list_filters()
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    tasks = task_manager.iter_tasks(fields=fields, **filters)
+
+    def generate_ndjson():
+        for task in tasks:
+            yield json.dumps(task) + "\n"
+
+    def generate_json():
+        # Array JSON enviado em partes, uma tarefa por vez
+        yield "["
+        separator = ""
+        for task in tasks:
+            yield separator + json.dumps(task)
+            separator = ","
+        yield "]"
+
+    if export_format == 'ndjson':
+        return Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+    return Response(stream_with_context(generate_json()), mimetype='application/json')
+
+@task_bp.route('/events', methods=['GET'])
+def task_events():
+    # Stream SSE com as alterações (created/updated/deleted/cleared)
+    heartbeat = current_app.config.get('SSE_HEARTBEAT_SECONDS', 15)
+    tenant = current_tenant.get()
+    subscription = broker.subscribe(tenant, limit=current_app.config.get('SSE_MAX_STREAMS'))
+    if subscription is None:
+        # Cada stream ocupa uma thread do worker: acima do limite, o cliente
+        # tenta de novo mais tarde em vez de esgotar o pool
+        response = jsonify({"error": "Limite de streams de eventos atingido"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    if 'event_relay' in current_app.extensions:
+        current_app.extensions['event_relay'].ensure_started()
+
+    def stream():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    item = subscription.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps(item)}\n\n"
+        finally:
+            broker.unsubscribe(subscription, tenant)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@task_bp.route('/stats', methods=['GET'])
+def task_stats():
+    task_manager = TaskManager(db)
+    return jsonify(task_manager.get_stats()), 200
+
+@task_bp.route('/search', methods=['GET'])
+def search_tasks():
+    task_manager = TaskManager(db)
+    completed = request.args.get('completed')
+    if completed is not None:
+        completed = completed.lower() == 'true'
+    category = request.args.get('category')
+    if category is not None and category not in TaskManager.CATEGORIES:
+        return jsonify({"error": "Categoria inválida"}), 400
+    try:
+        fields = TaskManager.parse_fields(request.args.get('fields'))
+        limit = int(request.args.get('limit', TaskManager.DEFAULT_PAGE_SIZE))
+        offset = int(request.args.get('offset', 0))
+        if limit < 1 or offset < 0:
+            raise ValueError("Paginação inválida")
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    try:
+        task_list, next_offset = task_manager.search_tasks(
+            request.args.get('q'), completed=completed, category=category,
+            fields=fields, limit=limit, offset=offset
+        )
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    return jsonify({"tasks": task_list, "next_offset": next_offset}), 200
 
 @task_bp.route('/', methods=['POST'])
 def add_task():
@@ -35,6 +217,26 @@ def add_task():
         return jsonify(task), 201
     return jsonify({"error": "Erro ao adicionar tarefa"}), 500
 
+@task_bp.route('/batch', methods=['POST'])
+def add_tasks_batch():
+    task_manager = TaskManager(db)
+    data = request.json
+    items = data.get('tasks') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Lista de tarefas é obrigatória"}), 400
+
+    results = task_manager.add_tasks(
+        items, chunk_size=current_app.config.get('BATCH_CHUNK_SIZE')
+    )
+    created = sum(1 for result in results if result["status"] == "created")
+    if created == len(results):
+        status = 201
+    elif created:
+        status = 207  # Sucesso parcial: ver o resultado de cada item
+    else:
+        status = 400
+    return jsonify({"created": created, "results": results}), status
+
 
 @task_bp.route('/<int:task_id>', methods=['PUT'])
 def edit_task(task_id):
@@ -48,20 +250,49 @@ def edit_task(task_id):
     )
     if task is None:
         return jsonify({"error": "Task not found"}), 404
-    return jsonify(task.to_dict()), 200
+    return jsonify(task), 200
 
 @task_bp.route('/<int:task_id>', methods=['DELETE'])
 def delete_task(task_id):
     task_manager = TaskManager(db)
-    task_manager.delete_task(task_id)
-    return jsonify({"message": f"Task {task_id} deleted"}), 200
+    deleted = task_manager.delete_task(task_id)
+    # Mantém o 200 para ids inexistentes; "deleted" indica se havia a tarefa
+    return jsonify({"message": f"Task {task_id} deleted", "deleted": deleted}), 200
+
+@task_bp.route('/complete', methods=['PATCH'])
+def complete_tasks():
+    task_manager = TaskManager(db)
+    data = request.get_json(silent=True) or {}
+    try:
+        ids = task_manager.complete_tasks(
+            ids=data.get('ids'),
+            category=data.get('category'),
+            deadline_before=data.get('deadline_before'),
+        )
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    return jsonify({"completed": ids, "count": len(ids)}), 200
+
+@task_bp.route('/', methods=['DELETE'])
+def delete_tasks():
+    task_manager = TaskManager(db)
+    data = request.get_json(silent=True) or {}
+    try:
+        ids = task_manager.delete_tasks(
+            ids=data.get('ids'),
+            category=data.get('category'),
+            deadline_before=data.get('deadline_before'),
+        )
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    return jsonify({"deleted": ids, "count": len(ids)}), 200
 
 @task_bp.route('/<int:task_id>/complete', methods=['PATCH'])
 def mark_completed(task_id):
     task_manager = TaskManager(db)
     task = task_manager.mark_completed(task_id)
     if task:
-        return jsonify(task.to_dict()), 200
+        return jsonify(task), 200
     return jsonify({"error": "Task not found"}), 404
 
 @task_bp.route('/clear', methods=['DELETE'])
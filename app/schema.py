@@ -0,0 +1,119 @@
+# DDL específico do SQLite que o create_all do SQLAlchemy não cobre
+
+# Gatilhos mantêm o índice sincronizado em todos os caminhos de escrita,
+# inclusive nas inserções e remoções em massa feitas via Core
+SEARCH_TRIGGERS = [
+    """CREATE TRIGGER task_fts_insert AFTER INSERT ON task BEGIN
+        INSERT INTO task_fts(rowid, description) VALUES (new.id, new.description);
+    END""",
+    """CREATE TRIGGER task_fts_delete AFTER DELETE ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END""",
+    """CREATE TRIGGER task_fts_update AFTER UPDATE OF description ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO task_fts(rowid, description) VALUES (new.id, new.description);
+    END""",
+]
+
+SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE task_fts USING fts5(
+        description,
+        content='task',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    *SEARCH_TRIGGERS,
+    # Indexa as tarefas que já existiam antes da criação da tabela de busca
+    "INSERT INTO task_fts(task_fts) VALUES ('rebuild')",
+]
+
+
+# Contadores por (categoria, concluída) atualizados na mesma transação de
+# cada escrita na tabela task
+STATS_TRIGGERS = [
+    """CREATE TRIGGER task_counter_insert AFTER INSERT ON task BEGIN
+        INSERT INTO task_counter(category_id, completed, count)
+        VALUES (IFNULL(new.category_id, 0), IFNULL(new.completed, 0), 1)
+        ON CONFLICT(category_id, completed) DO UPDATE SET count = count + 1;
+    END""",
+    """CREATE TRIGGER task_counter_delete AFTER DELETE ON task BEGIN
+        UPDATE task_counter SET count = count - 1
+        WHERE category_id = IFNULL(old.category_id, 0) AND completed = IFNULL(old.completed, 0);
+    END""",
+    """CREATE TRIGGER task_counter_update AFTER UPDATE OF category_id, completed ON task BEGIN
+        UPDATE task_counter SET count = count - 1
+        WHERE category_id = IFNULL(old.category_id, 0) AND completed = IFNULL(old.completed, 0);
+        INSERT INTO task_counter(category_id, completed, count)
+        VALUES (IFNULL(new.category_id, 0), IFNULL(new.completed, 0), 1)
+        ON CONFLICT(category_id, completed) DO UPDATE SET count = count + 1;
+    END""",
+]
+
+STATS_DDL = [
+    *STATS_TRIGGERS,
+    # Recalcula os contadores a partir das tarefas que já existiam
+    "DELETE FROM task_counter",
+    """INSERT INTO task_counter(category_id, completed, count)
+        SELECT IFNULL(category_id, 0), IFNULL(completed, 0), COUNT(*) FROM task GROUP BY 1, 2""",
+]
+
+
+ARCHIVE_STATS_DDL = [
+    # Tarefas arquivadas continuam nas estatísticas: mover uma tarefa de task
+    # para task_archive não altera os contadores
+    """CREATE TRIGGER task_archive_counter_insert AFTER INSERT ON task_archive BEGIN
+        INSERT INTO task_counter(category_id, completed, count)
+        VALUES (IFNULL(new.category_id, 0), IFNULL(new.completed, 0), 1)
+        ON CONFLICT(category_id, completed) DO UPDATE SET count = count + 1;
+    END""",
+    """CREATE TRIGGER task_archive_counter_delete AFTER DELETE ON task_archive BEGIN
+        UPDATE task_counter SET count = count - 1
+        WHERE category_id = IFNULL(old.category_id, 0) AND completed = IFNULL(old.completed, 0);
+    END""",
+]
+
+
+def _schema_object_exists(connection, name):
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+    ).first() is not None
+
+
+def install_search(connection):
+    if connection.dialect.name != 'sqlite' or _schema_object_exists(connection, 'task_fts'):
+        return
+    for statement in SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+
+
+def install_stats(connection):
+    if connection.dialect.name != 'sqlite' or _schema_object_exists(connection, 'task_counter_insert'):
+        return
+    for statement in STATS_DDL:
+        connection.exec_driver_sql(statement)
+
+
+def install_archive_stats(connection):
+    if connection.dialect.name != 'sqlite' or _schema_object_exists(connection, 'task_archive_counter_insert'):
+        return
+    for statement in ARCHIVE_STATS_DDL:
+        connection.exec_driver_sql(statement)
+
+
+def install_task_triggers(connection):
+    # Recria os gatilhos da tabela task (depois de uma reconstrução da tabela),
+    # sem reindexar a busca nem recalcular os contadores
+    if connection.dialect.name != 'sqlite':
+        return
+    for statement in SEARCH_TRIGGERS + STATS_TRIGGERS:
+        connection.exec_driver_sql(statement)
+
+
+def seed_categories(connection, categories):
+    # Tabela de consulta dos códigos de categoria usados em task.category_id
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO category(id, name) VALUES (?, ?)",
+        [(code, name) for code, name in enumerate(categories, start=1)],
+    )
@@ -0,0 +1,73 @@
+# Servidor de produção: gunicorn pré-fork com workers gthread. Cada worker
+# cria a aplicação (e suas conexões SQLite) depois do fork. Cada conexão em
+# /tasks/events ocupa uma thread do pool, então os streams por worker são
+# limitados (sse_stream_limit). GUNICORN_WORKER_CLASS=gevent (pacote gevent
+# instalado) troca as threads por greenlets, mas a espera pelo lock do SQLite
+# é uma chamada C bloqueante: enquanto uma escrita espera o busy_timeout, todo
+# o worker (leituras, streams SSE e o repasse de eventos) fica parado.
+import multiprocessing
+import os
+
+
+def server_options(env):
+    workers = env.get('WEB_CONCURRENCY') or multiprocessing.cpu_count() * 2 + 1
+    return {
+        'bind': env.get('BIND', '0.0.0.0:8000'),
+        'workers': int(workers),
+        'worker_class': env.get('GUNICORN_WORKER_CLASS', 'gthread'),
+        'threads': int(env.get('GUNICORN_THREADS', 4)),
+        # Conexões simultâneas por worker gevent (inclui os streams SSE)
+        'worker_connections': int(env.get('GUNICORN_WORKER_CONNECTIONS', 1000)),
+        'timeout': int(env.get('GUNICORN_TIMEOUT', 30)),
+        'graceful_timeout': int(env.get('GUNICORN_GRACEFUL_TIMEOUT', 30)),
+        'keepalive': int(env.get('GUNICORN_KEEPALIVE', 5)),
+        # Reciclagem periódica dos workers, sem derrubar requisições em curso
+        'max_requests': int(env.get('GUNICORN_MAX_REQUESTS', 1000)),
+        'max_requests_jitter': int(env.get('GUNICORN_MAX_REQUESTS_JITTER', 100)),
+        'preload_app': env.get('GUNICORN_PRELOAD', '0') == '1',
+        # GUNICORN_ACCESS_LOG vazio desliga o log de acesso
+        'accesslog': env.get('GUNICORN_ACCESS_LOG', '-') or None,
+    }
+
+
+def sse_stream_limit(env):
+    # Streams SSE simultâneos por worker (0: sem limite). Com gthread, metade
+    # das threads fica reservada para as demais requisições
+    if env.get('SSE_MAX_STREAMS'):
+        return int(env['SSE_MAX_STREAMS'])
+    if env.get('GUNICORN_WORKER_CLASS', 'gthread') == 'gthread':
+        return max(1, int(env.get('GUNICORN_THREADS', 4)) // 2)
+    return 0
+
+
+def run_production(env=os.environ):
+    from gunicorn.app.base import BaseApplication
+
+    from app import create_app, db
+
+    class TaskServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            self.application = None
+            super().__init__()
+
+        def load_config(self):
+            for name, value in self.options.items():
+                self.cfg.set(name, value)
+            self.cfg.set('post_fork', self.post_fork)
+
+        def load(self):
+            if self.application is None:
+                self.application = create_app('production')
+            return self.application
+
+        def post_fork(self, server, worker):
+            # Com preload, o mestre já abriu conexões (migrações); cada worker
+            # descarta as herdadas e abre as suas
+            if self.application is not None:
+                with self.application.app_context():
+                    db.engine.dispose(close=False)
+                if 'tenants' in self.application.extensions:
+                    self.application.extensions['tenants'].dispose_all()
+
+    TaskServer(server_options(env)).run()
@@ -0,0 +1,219 @@
+# Roteamento por tenant: cada tenant tem o próprio arquivo SQLite, então a
+# contenção de escrita fica restrita a ele. O tenant vem do cabeçalho
+# X-Tenant ou do prefixo /t/<tenant>/ e vale para a sessão do SQLAlchemy
+# durante a requisição (ou dentro de use_tenant).
+import contextlib
+import contextvars
+import os
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from flask import current_app, g, has_app_context, jsonify, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+
+from .database import configure_sqlite
+from .metrics import instrument_engine
+from .migrations import migrate
+
+TENANT_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+current_tenant = contextvars.ContextVar('current_tenant', default=None)
+
+
+@contextlib.contextmanager
+def use_tenant(tenant):
+    # Para código fora de requisições (CLI, testes, escritor de group commit)
+    token = current_tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        current_tenant.reset(token)
+
+
+class TenantSession(Session):
+    # Sessão que usa o banco do tenant atual; sem tenant, o banco principal
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        tenant = current_tenant.get()
+        if bind is None and tenant is not None and has_app_context():
+            engines = current_app.extensions.get('tenants')
+            if engines is not None:
+                return engines.engine(tenant)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class TenantEngines:
+    # Cache LRU dos engines abertos: os menos usados são descartados quando o
+    # limite é atingido ou quando ficam ociosos por mais de idle_seconds
+
+    def __init__(self, directory, metadata, engine_options=None, pragmas=None,
+                 instrument=False, max_open=64, idle_seconds=300):
+        self.directory = directory
+        self.metadata = metadata
+        self.engine_options = engine_options or {}
+        self.pragmas = pragmas
+        self.instrument = instrument
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self._engines = OrderedDict()
+        # Um lock por tenant sendo aberto, para não abrir o mesmo banco duas vezes
+        self._opening = {}
+        self._sweeper = None
+        self._lock = threading.Lock()
+
+    def path(self, tenant):
+        return os.path.join(self.directory, f"{tenant}.db")
+
+    def exists(self, tenant):
+        # Só tenants criados (create ou "flask tenant create") têm banco
+        with self._lock:
+            if tenant in self._engines:
+                return True
+        return os.path.exists(self.path(tenant))
+
+    def create(self, tenant):
+        return self.engine(tenant, create=True)
+
+    def engine(self, tenant, create=False):
+        if not TENANT_PATTERN.match(tenant):
+            raise ValueError("Tenant inválido")
+        with self._lock:
+            engine = self._touch(tenant)
+            if engine is not None:
+                return engine
+            opening = self._opening.setdefault(tenant, threading.Lock())
+        # Abertura e migrações fora do lock global: só quem usa o mesmo
+        # tenant espera, as consultas dos demais tenants seguem normalmente
+        with opening:
+            with self._lock:
+                engine = self._touch(tenant)
+            if engine is not None:
+                return engine
+            try:
+                # Nomes desconhecidos não viram arquivos novos no disco
+                if not create and not os.path.exists(self.path(tenant)):
+                    raise LookupError("Tenant não encontrado")
+                engine = self._open(tenant)
+            finally:
+                with self._lock:
+                    self._opening.pop(tenant, None)
+            now = time.monotonic()
+            with self._lock:
+                self._engines[tenant] = [engine, now]
+                evicted = self._evict(now)
+        self._ensure_sweeper()
+        for old in evicted:
+            old.dispose()
+        return engine
+
+    def _touch(self, tenant):
+        # Chamado com o lock: marca o uso de um engine já aberto
+        entry = self._engines.get(tenant)
+        if entry is None:
+            return None
+        entry[1] = time.monotonic()
+        self._engines.move_to_end(tenant)
+        return entry[0]
+
+    def _open(self, tenant):
+        os.makedirs(self.directory, exist_ok=True)
+        engine = create_engine(f"sqlite:///{self.path(tenant)}", **self.engine_options)
+        configure_sqlite(engine, self.pragmas)
+        if self.instrument:
+            instrument_engine(engine)
+        migrate(engine, self.metadata)
+        return engine
+
+    def _evict(self, now):
+        # A ordem do OrderedDict é a do último uso: os ociosos ficam no início.
+        # Retorna os engines removidos, fechados depois fora do lock
+        evicted = []
+        while self._engines:
+            tenant, (engine, last_used) = next(iter(self._engines.items()))
+            if len(self._engines) <= self.max_open and now - last_used < self.idle_seconds:
+                break
+            del self._engines[tenant]
+            evicted.append(engine)
+        return evicted
+
+    def sweep(self):
+        # Fecha os engines ociosos mesmo sem novos acessos a tenants
+        with self._lock:
+            evicted = self._evict(time.monotonic())
+        for engine in evicted:
+            engine.dispose()
+        return len(evicted)
+
+    def _ensure_sweeper(self):
+        # Iniciada sob demanda, para que a thread exista só depois do fork
+        with self._lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._sweeper = threading.Thread(
+                target=_sweep_periodically, args=(weakref.ref(self), max(1.0, self.idle_seconds / 2)),
+                name='tenant-sweeper', daemon=True,
+            )
+            self._sweeper.start()
+
+    def open_tenants(self):
+        with self._lock:
+            return list(self._engines)
+
+    def dispose_all(self):
+        with self._lock:
+            for engine, _ in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+
+
+def _sweep_periodically(reference, interval):
+    # Referência fraca: a thread termina quando o TenantEngines é coletado
+    while True:
+        time.sleep(interval)
+        engines = reference()
+        if engines is None:
+            return
+        engines.sweep()
+        del engines
+
+
+def init_tenants(app, metadata):
+    directory = app.config.get('TENANT_DB_DIR')
+    if directory:
+        app.extensions['tenants'] = TenantEngines(
+            directory, metadata,
+            engine_options=app.config.get('SQLALCHEMY_ENGINE_OPTIONS'),
+            pragmas=app.config.get('SQLITE_PRAGMAS'),
+            instrument='metrics' in app.extensions,
+            max_open=app.config.get('TENANT_MAX_OPEN', 64),
+            idle_seconds=app.config.get('TENANT_IDLE_SECONDS', 300),
+        )
+
+    @app.url_value_preprocessor
+    def pull_tenant(endpoint, values):
+        if values and 'tenant' in values:
+            g.url_tenant = values.pop('tenant')
+
+    @app.before_request
+    def select_tenant():
+        tenant = g.pop('url_tenant', None) or request.headers.get('X-Tenant')
+        if tenant is None:
+            return None
+        if 'tenants' not in app.extensions:
+            return jsonify({"error": "Tenants não habilitados"}), 400
+        if not TENANT_PATTERN.match(tenant):
+            return jsonify({"error": "Tenant inválido"}), 400
+        if not app.extensions['tenants'].exists(tenant):
+            return jsonify({"error": "Tenant não encontrado"}), 404
+        g.tenant_token = current_tenant.set(tenant)
+        return None
+
+    @app.teardown_request
+    def reset_tenant(exception=None):
+        token = g.pop('tenant_token', None)
+        if token is not None:
+            current_tenant.reset(token)
@@ -0,0 +1,203 @@
+# Benchmark de escala do TaskManager e das rotas /tasks.
+#
+# Uso:
+#   python -m benchmarks.bench_tasks --rows 10000 100000 --save benchmarks/baselines/local.json
+#   python -m benchmarks.bench_tasks --rows 10000 --compare benchmarks/baselines/local.json
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+SEED_CHUNK_SIZE = 5_000
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(samples, peak_bytes):
+    return {
+        "runs": len(samples),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+        "peak_kib": round(peak_bytes / 1024, 1),
+    }
+
+
+def measure(operation, iterations):
+    # Latência medida sem tracemalloc; o pico de memória vem de uma execução extra
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return summarize(samples, peak)
+
+
+def seed(manager, rows, rng):
+    from app.models import TaskManager
+
+    start_date = datetime(2025, 1, 1)
+    for offset in range(0, rows, SEED_CHUNK_SIZE):
+        size = min(SEED_CHUNK_SIZE, rows - offset)
+        manager.add_tasks([
+            {
+                "description": f"Tarefa sintética {offset + i}",
+                "category": rng.choice(TaskManager.CATEGORIES),
+                "deadline": (start_date + timedelta(days=rng.randrange(730))).strftime("%Y-%m-%d"),
+            }
+            for i in range(size)
+        ])
+    # Cerca de um terço das tarefas concluídas
+    manager.complete_tasks(deadline_before="2025-09-01")
+
+
+def run_size(rows, iterations, rng):
+    from app import create_app, db
+    from app.models import TaskManager
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        app = create_app("production")
+        client = app.test_client()
+        results = {}
+
+        with app.app_context():
+            manager = TaskManager(db)
+            started = time.perf_counter()
+            seed(manager, rows, rng)
+            results["seed"] = {"rows": rows, "seconds": round(time.perf_counter() - started, 3)}
+
+            def random_id():
+                return rng.randint(1, rows)
+
+            manager_ops = {
+                "manager.get_tasks": lambda: manager.get_tasks(),
+                "manager.get_tasks_pending": lambda: manager.get_tasks(completed=False),
+                "manager.get_task_rows_page": lambda: manager.get_task_rows(limit=100),
+                "manager.add_task": lambda: manager.add_task("Nova tarefa", "Casa", "2025-06-01"),
+                "manager.edit_task": lambda: manager.edit_task(random_id(), description="Editada"),
+                "manager.mark_completed": lambda: manager.mark_completed(random_id()),
+            }
+            for name, operation in manager_ops.items():
+                results[name] = measure(operation, iterations)
+                db.session.remove()
+
+        route_ops = {
+            "GET /tasks/": lambda: client.get("/tasks/"),
+            "GET /tasks/?completed=false": lambda: client.get("/tasks/?completed=false"),
+            "GET /tasks/?limit=100": lambda: client.get("/tasks/?limit=100"),
+            "GET /tasks/stats": lambda: client.get("/tasks/stats"),
+            "GET /tasks/search": lambda: client.get("/tasks/search?q=sint*&limit=20"),
+            "POST /tasks/": lambda: client.post("/tasks/", json={
+                "description": "Nova", "category": "Casa", "deadline": "2025-06-01"
+            }),
+            "PUT /tasks/<id>": lambda: client.put(f"/tasks/{rng.randint(1, rows)}", json={
+                "description": "Editada"
+            }),
+            "PATCH /tasks/<id>/complete": lambda: client.patch(f"/tasks/{rng.randint(1, rows)}/complete"),
+        }
+        for name, operation in route_ops.items():
+            results[name] = measure(operation, iterations)
+
+        # Operação destrutiva: uma única execução, por último
+        with app.app_context():
+            manager = TaskManager(db)
+            tracemalloc.start()
+            started = time.perf_counter()
+            manager.delete_all()
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results["manager.delete_all"] = summarize([elapsed], peak)
+            db.engine.dispose()
+        return results
+
+
+def compare(current, baseline, threshold):
+    # Retorna as operações cujo p50 piorou além do limite em relação à base
+    regressions = []
+    for rows, operations in current["results"].items():
+        for name, stats in operations.items():
+            base = baseline.get("results", {}).get(rows, {}).get(name)
+            if not base or "p50_ms" not in stats or not base.get("p50_ms"):
+                continue
+            ratio = stats["p50_ms"] / base["p50_ms"]
+            if ratio > threshold:
+                regressions.append((rows, name, base["p50_ms"], stats["p50_ms"], ratio))
+    return regressions
+
+
+def print_report(report):
+    for rows, operations in report["results"].items():
+        print(f"\n== {rows} tarefas ==")
+        print(f"{'operação':32} {'p50':>10} {'p95':>10} {'p99':>10} {'pico KiB':>10}")
+        for name, stats in operations.items():
+            if "p50_ms" not in stats:
+                print(f"{name:32} {stats['seconds']:>9.3f}s")
+                continue
+            print(f"{name:32} {stats['p50_ms']:>10} {stats['p95_ms']:>10} "
+                  f"{stats['p99_ms']:>10} {stats['peak_kib']:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de escala do gerenciador de tarefas")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="grava o resultado em JSON (ex.: benchmarks/baselines/local.json)")
+    parser.add_argument("--compare", help="JSON de base para detectar regressões")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="razão máxima aceita entre o p50 atual e o da base")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+    for rows in args.rows:
+        report["results"][str(rows)] = run_size(rows, args.iterations, rng)
+    print_report(report)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2, ensure_ascii=False)
+        print(f"\nResultado gravado em {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            regressions = compare(report, json.load(handle), args.threshold)
+        for rows, name, before, after, ratio in regressions:
+            print(f"REGRESSÃO [{rows}] {name}: p50 {before} ms -> {after} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+# Reprodução de carga concorrente a partir de um trace JSONL.
+#
+# Cada linha do trace é uma requisição: {"at": 0.01, "method": "PUT",
+# "path": "/tasks/{id}", "query": "", "json": {...}}. "{id}" é trocado pelo id
+# de uma tarefa criada durante a própria reprodução. Traces podem ser gerados
+# com a mistura padrão ou gravados de um servidor real com
+# TRAFFIC_RECORD_PATH=trace.jsonl.
+#
+# Uso:
+#   python -m benchmarks.load_replay generate --requests 5000 --output /tmp/trace.jsonl
+#   python -m benchmarks.load_replay replay --trace /tmp/trace.jsonl --workers 16 --rate 200
+#   python -m benchmarks.load_replay replay --trace /tmp/trace.jsonl --url http://127.0.0.1:8000
+import argparse
+import http.client
+import json
+import os
+import platform
+import queue
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from app.models import TaskManager
+from benchmarks.bench_tasks import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# As mesmas categorias aceitas pelo servidor
+CATEGORIES = TaskManager.CATEGORIES
+
+# Peso de cada tipo de requisição no trace gerado
+DEFAULT_MIX = {
+    "list": 30,
+    "list_pending": 10,
+    "list_completed": 5,
+    "add": 25,
+    "edit": 12,
+    "complete": 10,
+    "delete": 7,
+    "clear": 1,
+}
+
+
+def generate_request(kind, rng):
+    deadline = (datetime(2025, 1, 1) + timedelta(days=rng.randrange(365))).strftime("%Y-%m-%d")
+    if kind == "list":
+        return {"method": "GET", "path": "/tasks/", "query": ""}
+    if kind == "list_pending":
+        return {"method": "GET", "path": "/tasks/", "query": "completed=false"}
+    if kind == "list_completed":
+        return {"method": "GET", "path": "/tasks/", "query": "completed=true"}
+    if kind == "add":
+        return {"method": "POST", "path": "/tasks/", "json": {
+            "description": f"Tarefa {rng.randrange(10**6)}",
+            "category": rng.choice(CATEGORIES),
+            "deadline": deadline,
+        }}
+    if kind == "edit":
+        return {"method": "PUT", "path": "/tasks/{id}", "json": {"description": "Editada", "deadline": deadline}}
+    if kind == "complete":
+        return {"method": "PATCH", "path": "/tasks/{id}/complete"}
+    if kind == "delete":
+        return {"method": "DELETE", "path": "/tasks/{id}"}
+    if kind == "clear":
+        return {"method": "DELETE", "path": "/tasks/clear"}
+    raise ValueError(f"Tipo de requisição desconhecido: {kind}")
+
+
+def generate_trace(count, rate, mix, rng):
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    trace = []
+    for index in range(count):
+        entry = generate_request(rng.choices(kinds, weights)[0], rng)
+        trace.append({"at": round(index / rate, 4), "query": "", "json": None, **entry})
+    return trace
+
+
+def load_trace(path):
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def endpoint_name(entry):
+    # Agrupa o relatório por rota, separando a listagem por filtro de status
+    name = f"{entry['method']} {entry['path']}"
+    if entry["method"] == "GET" and "completed=" in (entry.get("query") or ""):
+        name += "?completed"
+    return name
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(directory, server_workers, threads, extra_env):
+    # Sobe "python run.py --production" num banco temporário e espera o /readyz
+    port = free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'replay.db')}",
+        "BIND": f"127.0.0.1:{port}",
+        "WEB_CONCURRENCY": str(server_workers),
+        "GUNICORN_THREADS": str(threads),
+        "GUNICORN_ACCESS_LOG": "",
+        "SLOW_REQUEST_MS": "1000000",
+        **extra_env,
+    }
+    log = open(os.path.join(directory, "server.log"), "w")
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "run.py"), "--production"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Servidor terminou ao iniciar; ver {log.name}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/readyz")
+            ready = connection.getresponse().status == 200
+            connection.close()
+            if ready:
+                return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Servidor não ficou pronto em 30 s")
+
+
+class LiveIds:
+    # Ids criados durante a reprodução, usados no lugar de "{id}"
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.ids = []
+        self.lock = threading.Lock()
+
+    def add(self, task_id):
+        with self.lock:
+            self.ids.append(task_id)
+
+    def pick(self, remove=False):
+        with self.lock:
+            if not self.ids:
+                return 0  # nenhuma tarefa ainda: a requisição recebe 404
+            index = self.rng.randrange(len(self.ids))
+            if remove:
+                self.ids[index] = self.ids[-1]
+                return self.ids.pop()
+            return self.ids[index]
+
+    def clear(self):
+        with self.lock:
+            self.ids.clear()
+
+
+def send(connection, entry, live_ids):
+    path = entry["path"]
+    if "{id}" in path:
+        path = path.replace("{id}", str(live_ids.pick(remove=entry["method"] == "DELETE")))
+    if entry.get("query"):
+        path = f"{path}?{entry['query']}"
+    body = None
+    headers = {}
+    if entry.get("json") is not None:
+        body = json.dumps(entry["json"]).encode()
+        headers["Content-Type"] = "application/json"
+    connection.request(entry["method"], path, body=body, headers=headers)
+    response = connection.getresponse()
+    payload = response.read()
+    if entry["method"] == "POST" and response.status == 201:
+        live_ids.add(json.loads(payload)["id"])
+    elif entry["path"] == "/tasks/clear" and response.status == 200:
+        live_ids.clear()
+    return response.status, payload
+
+
+def replay(trace, url, workers, rate, seed, timeout=30):
+    # Carga em malha aberta: cada requisição tem um horário agendado (pelo
+    # "at" do trace ou por --rate) e a latência conta a partir dele, incluindo
+    # a espera por um worker livre
+    target = urlsplit(url)
+    live_ids = LiveIds(random.Random(seed))
+    jobs = queue.Queue()
+    results = []
+    results_lock = threading.Lock()
+
+    def worker():
+        connection = http.client.HTTPConnection(target.hostname, target.port, timeout=timeout)
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            scheduled, entry = job
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                status, payload = send(connection, entry, live_ids)
+                locked = status == 503 and b"database is locked" in payload
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(target.hostname, target.port, timeout=timeout)
+                status, locked = None, False
+            elapsed = time.perf_counter() - scheduled
+            with results_lock:
+                results.append((endpoint_name(entry), status, locked, elapsed))
+        connection.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    for index, entry in enumerate(trace):
+        offset = index / rate if rate else entry.get("at", 0)
+        jobs.put((started + offset, entry))
+    for _ in threads:
+        jobs.put(None)
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def summarize(results, duration):
+    by_endpoint = {}
+    for name, status, locked, elapsed in results:
+        by_endpoint.setdefault(name, []).append((status, locked, elapsed))
+    by_endpoint["total"] = [(status, locked, elapsed) for _, status, locked, elapsed in results]
+
+    report = {}
+    for name, samples in by_endpoint.items():
+        latencies = [elapsed for _, _, elapsed in samples]
+        # Erro: falha de conexão ou status 5xx (404 de ids já removidos é esperado)
+        errors = sum(1 for status, _, _ in samples if status is None or status >= 500)
+        locked = sum(1 for _, is_locked, _ in samples if is_locked)
+        report[name] = {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / duration, 1),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "error_rate": round(errors / len(samples), 4),
+            "locked_rate": round(locked / len(samples), 4),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{'endpoint':32} {'req':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'erros':>7} {'locked':>7}")
+    for name, stats in report.items():
+        print(f"{name:32} {stats['requests']:>7} {stats['throughput_rps']:>8} {stats['p50_ms']:>9} "
+              f"{stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['error_rate']:>7.2%} {stats['locked_rate']:>7.2%}")
+
+
+def parse_env(values):
+    # "--server-env GROUP_COMMIT=1" repassa variáveis ao servidor iniciado
+    env = {}
+    for value in values or ():
+        name, _, setting = value.partition("=")
+        env[name] = setting
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reprodução de carga concorrente nas rotas /tasks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="gera um trace com a mistura padrão de requisições")
+    generate.add_argument("--requests", type=int, default=5000)
+    generate.add_argument("--rate", type=float, default=200, help="requisições por segundo no trace")
+    generate.add_argument("--seed", type=int, default=42)
+    generate.add_argument("--output", required=True)
+
+    run = commands.add_parser("replay", help="reproduz um trace contra o servidor")
+    run.add_argument("--trace", required=True)
+    run.add_argument("--workers", type=int, default=16, help="clientes concorrentes")
+    run.add_argument("--rate", type=float, help="requisições por segundo (padrão: o ritmo do trace)")
+    run.add_argument("--url", help="servidor já em execução; sem isso, um é iniciado localmente")
+    run.add_argument("--server-workers", type=int, default=2)
+    run.add_argument("--server-threads", type=int, default=4)
+    run.add_argument("--server-env", action="append", metavar="NOME=VALOR")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--save", help="grava o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        trace = generate_trace(args.requests, args.rate, DEFAULT_MIX, random.Random(args.seed))
+        with open(args.output, "w", encoding="utf-8") as handle:
+            for entry in trace:
+                handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        print(f"{len(trace)} requisições gravadas em {args.output}")
+        return 0
+
+    trace = load_trace(args.trace)
+    with tempfile.TemporaryDirectory() as directory:
+        process = None
+        url = args.url
+        if url is None:
+            process, url = start_server(
+                directory, args.server_workers, args.server_threads, parse_env(args.server_env)
+            )
+        try:
+            results, duration = replay(trace, url, args.workers, args.rate, args.seed)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "trace": args.trace,
+            "workers": args.workers,
+            "rate": args.rate,
+            "server_workers": None if args.url else args.server_workers,
+            "duration_s": round(duration, 3),
+        },
+        "results": summarize(results, duration),
+    }
+    print_report(report["results"])
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2, ensure_ascii=False)
+        print(f"\nResultado gravado em {args.save}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
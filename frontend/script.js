@@ -1,62 +1,324 @@
-const baseUrl = "http://127.0.0.1:5000/tasks/";
+// Relativo: a API é servida pela mesma origem do frontend
+const baseUrl = "/tasks/";
 const CATEGORIES = ["Trabalho", "Pessoal", "Casa", "Saúde", "Finanças"];
 
-async function fetchTasks() {
-    const pendingTasksContainer = document.getElementById("pending-tasks");
-    const completedTasksContainer = document.getElementById("completed-tasks");
+// Altura fixa de cada linha (em px, inclui o espaçamento): permite calcular
+// quais tarefas estão visíveis sem medir o DOM
+const ROW_HEIGHT = 56;
+// Linhas extras renderizadas acima e abaixo da área visível
+const OVERSCAN = 5;
 
-    pendingTasksContainer.innerHTML = "";
-    completedTasksContainer.innerHTML = "";
+// Store local: tarefas por id e, para cada lista, os ids ordenados por prazo
+// (sem prazo primeiro) e id, a mesma ordem da API
+const store = {
+    tasks: new Map(),
+    views: { pending: [], completed: [] },
+};
+// Exclusões otimistas ainda sem resposta: eventos atrasados não as recriam
+const pendingDeletes = new Set();
+let nextTempId = -1;
 
-    try {
-        const response = await fetch(baseUrl);
-        const tasks = await response.json();
+function compareTasks(a, b) {
+    const deadlineA = a.deadline || "";
+    const deadlineB = b.deadline || "";
+    if (deadlineA !== deadlineB) {
+        return deadlineA < deadlineB ? -1 : 1;
+    }
+    return a.id - b.id;
+}
+
+function viewOf(task) {
+    return task.completed ? "completed" : "pending";
+}
+
+// Busca binária da posição da tarefa na lista ordenada
+function findIndex(ids, task) {
+    let low = 0;
+    let high = ids.length;
+    while (low < high) {
+        const middle = (low + high) >> 1;
+        if (compareTasks(store.tasks.get(ids[middle]), task) < 0) {
+            low = middle + 1;
+        } else {
+            high = middle;
+        }
+    }
+    return low;
+}
+
+function upsertTask(task) {
+    removeTask(task.id, false);
+    store.tasks.set(task.id, task);
+    const ids = store.views[viewOf(task)];
+    ids.splice(findIndex(ids, task), 0, task.id);
+    scheduleRender(viewOf(task));
+}
+
+function removeTask(taskId, render = true) {
+    const task = store.tasks.get(taskId);
+    if (!task) {
+        return null;
+    }
+    const ids = store.views[viewOf(task)];
+    ids.splice(findIndex(ids, task), 1);
+    store.tasks.delete(taskId);
+    if (render) {
+        scheduleRender(viewOf(task));
+    }
+    return task;
+}
+
+function replaceTasks(tasks) {
+    store.tasks = new Map(tasks.map(task => [task.id, task]));
+    store.views.pending = [];
+    store.views.completed = [];
+    // A API já devolve as tarefas na ordem de exibição
+    tasks.forEach(task => store.views[viewOf(task)].push(task.id));
+    scheduleRender("pending");
+    scheduleRender("completed");
+}
 
-        tasks.forEach(task => {
-            const taskElement = document.createElement("li");
-            taskElement.innerText = `${task.description} - ${task.category} - Prazo: ${task.deadline}`;
+// ------------------------- Lista virtualizada -------------------------
 
-            const completeButton = document.createElement("button");
-            completeButton.textContent = "Concluir";
-            completeButton.addEventListener("click", () => markTaskCompleted(task.id));
+class VirtualList {
+    constructor(viewport, list, view) {
+        this.viewport = viewport;
+        this.list = list;
+        this.view = view;
+        this.rows = new Map();  // id -> <li> renderizado
+        this.frame = null;
+        viewport.addEventListener("scroll", () => this.schedule(), { passive: true });
+    }
 
-            const deleteButton = document.createElement("button");
-            deleteButton.textContent = "Deletar";
-            deleteButton.addEventListener("click", () => deleteTask(task.id));
+    schedule() {
+        // Várias alterações no mesmo quadro geram uma única renderização
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this.render();
+            });
+        }
+    }
 
-            taskElement.appendChild(completeButton);
-            taskElement.appendChild(deleteButton);
+    render() {
+        const ids = store.views[this.view];
+        this.list.style.height = `${ids.length * ROW_HEIGHT}px`;
 
-            if (task.completed) {
-                taskElement.classList.add("completed");
-                completedTasksContainer.appendChild(taskElement);
-            } else {
-                pendingTasksContainer.appendChild(taskElement);
+        const first = Math.max(0, Math.floor(this.viewport.scrollTop / ROW_HEIGHT) - OVERSCAN);
+        const visibleRows = Math.ceil(this.viewport.clientHeight / ROW_HEIGHT) + 2 * OVERSCAN;
+        const last = Math.min(ids.length, first + visibleRows);
+
+        const visible = new Set();
+        for (let index = first; index < last; index++) {
+            const task = store.tasks.get(ids[index]);
+            visible.add(task.id);
+            let row = this.rows.get(task.id);
+            if (!row) {
+                row = createTaskElement();
+                this.rows.set(task.id, row);
+                this.list.appendChild(row);
             }
-        });
+            updateTaskElement(row, task);
+            row.style.transform = `translateY(${index * ROW_HEIGHT}px)`;
+        }
+        for (const [taskId, row] of this.rows) {
+            if (!visible.has(taskId)) {
+                row.remove();
+                this.rows.delete(taskId);
+            }
+        }
+    }
+}
+
+function createTaskElement() {
+    const taskElement = document.createElement("li");
+    const text = document.createElement("span");
+    text.className = "task-text";
+
+    const completeButton = document.createElement("button");
+    completeButton.textContent = "Concluir";
+    completeButton.dataset.action = "complete";
+
+    const deleteButton = document.createElement("button");
+    deleteButton.textContent = "Deletar";
+    deleteButton.dataset.action = "delete";
+
+    taskElement.append(text, completeButton, deleteButton);
+    return taskElement;
+}
+
+function updateTaskElement(taskElement, task) {
+    // Só altera o DOM quando a tarefa exibida mudou
+    if (taskElement.task === task) {
+        return;
+    }
+    taskElement.task = task;
+    taskElement.dataset.id = task.id;
+    taskElement.querySelector(".task-text").textContent =
+        `${task.description} - ${task.category} - Prazo: ${task.deadline}`;
+    taskElement.classList.toggle("completed", Boolean(task.completed));
+    // Tarefas ainda não confirmadas pelo servidor não aceitam ações
+    taskElement.classList.toggle("saving", Boolean(task.saving));
+    taskElement.querySelectorAll("button").forEach(button => {
+        button.disabled = Boolean(task.saving);
+    });
+}
+
+const lists = {
+    pending: new VirtualList(
+        document.getElementById("pending-viewport"), document.getElementById("pending-tasks"), "pending"
+    ),
+    completed: new VirtualList(
+        document.getElementById("completed-viewport"), document.getElementById("completed-tasks"), "completed"
+    ),
+};
+
+function scheduleRender(view) {
+    lists[view].schedule();
+}
+
+// Um único listener para os botões de todas as linhas
+document.querySelector(".task-lists").addEventListener("click", event => {
+    const button = event.target.closest("button[data-action]");
+    if (!button) {
+        return;
+    }
+    const taskId = Number(button.closest("li").dataset.id);
+    if (button.dataset.action === "complete") {
+        markTaskCompleted(taskId);
+    } else if (button.dataset.action === "delete") {
+        deleteTask(taskId);
+    }
+});
+
+// ------------------------------ Servidor ------------------------------
+
+async function fetchTasks() {
+    try {
+        const response = await fetch(baseUrl);
+        replaceTasks(await response.json());
     } catch (error) {
         console.error("Erro ao buscar tarefas:", error);
     }
 }
 
-async function addTask(description, category, deadline) {
-    await fetch(baseUrl, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ description, category, deadline }),
-    });
+// Aplica no store os eventos publicados pelo servidor, sem recarregar a lista
+function applyTaskEvent(event) {
+    switch (event.type) {
+        case "created":
+        case "updated":
+            if (!pendingDeletes.has(event.task.id)) {
+                upsertTask(event.task);
+            }
+            break;
+        case "deleted":
+            removeTask(event.id);
+            break;
+        case "archived":
+            event.ids.forEach(taskId => removeTask(taskId));
+            break;
+        case "cleared":
+            replaceTasks([]);
+            break;
+        case "resync":
+            fetchTasks();
+            break;
+    }
+}
 
-    fetchTasks();
+function subscribeToTaskEvents() {
+    if (!window.EventSource) {
+        return;
+    }
+    const source = new EventSource(`${baseUrl}events`);
+    let connected = false;
+
+    source.onmessage = message => applyTaskEvent(JSON.parse(message.data));
+    source.onopen = () => {
+        // Após uma reconexão, eventos podem ter sido perdidos
+        if (connected) {
+            fetchTasks();
+        }
+        connected = true;
+    };
+}
+
+// As ações são aplicadas no store antes da resposta (atualização otimista).
+// A resposta do servidor substitui a versão local; em caso de erro, o estado
+// anterior é restaurado. O evento SSE correspondente é idempotente
+async function addTask(description, category, deadline) {
+    const temporary = {
+        id: nextTempId--,
+        description,
+        category,
+        deadline: deadline || null,
+        completed: false,
+        saving: true,
+    };
+    upsertTask(temporary);
+    try {
+        const response = await fetch(baseUrl, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ description, category, deadline }),
+        });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const task = await response.json();
+        removeTask(temporary.id);
+        upsertTask(task);
+    } catch (error) {
+        removeTask(temporary.id);
+        console.error("Erro ao adicionar tarefa:", error);
+    }
 }
 
 async function markTaskCompleted(taskId) {
-    await fetch(`${baseUrl}${taskId}/complete`, { method: "PATCH" });
-    fetchTasks();
+    const previous = store.tasks.get(taskId);
+    if (!previous || previous.completed) {
+        return;
+    }
+    upsertTask({ ...previous, completed: true, saving: true });
+    try {
+        const response = await fetch(`${baseUrl}${taskId}/complete`, { method: "PATCH" });
+        if (response.status === 404) {
+            removeTask(taskId);
+            return;
+        }
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const task = await response.json();
+        // Pode ter sido removida por outro cliente enquanto a requisição corria
+        if (store.tasks.has(taskId)) {
+            upsertTask(task);
+        }
+    } catch (error) {
+        if (store.tasks.has(taskId)) {
+            upsertTask(previous);
+        }
+        console.error("Erro ao concluir tarefa:", error);
+    }
 }
 
 async function deleteTask(taskId) {
-    await fetch(`${baseUrl}${taskId}`, { method: "DELETE" });
-    fetchTasks();
+    const previous = removeTask(taskId);
+    if (!previous) {
+        return;
+    }
+    pendingDeletes.add(taskId);
+    try {
+        const response = await fetch(`${baseUrl}${taskId}`, { method: "DELETE" });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+    } catch (error) {
+        upsertTask(previous);
+        console.error("Erro ao deletar tarefa:", error);
+    } finally {
+        pendingDeletes.delete(taskId);
+    }
 }
 
 document.getElementById("task-form").addEventListener("submit", event => {
@@ -85,3 +347,4 @@ toggleThemeButton.addEventListener('click', () => {
 });
 
 fetchTasks();
+subscribeToTaskEvents();
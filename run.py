@@ -1,6 +1,20 @@
+import os
+import sys
+
 from app import create_app
 
-app = create_app()
+
+def main():
+    # "python run.py --production" (ou APP_ENV=production) sobe o servidor
+    # pré-fork; sem isso, o servidor de desenvolvimento do Flask
+    if '--production' in sys.argv[1:] or os.getenv('APP_ENV') == 'production':
+        from app.server import run_production
+        run_production()
+    else:
+        create_app().run(debug=True)
+
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    main()
+else:
+    app = create_app('production' if os.getenv('APP_ENV') == 'production' else None)
@@ -1,7 +1,18 @@
 import pytest
 from app import create_app, db
 from app.models import TaskManager, Task
-from datetime import datetime
+from app.events import broker
+from app.migrations import MIGRATIONS, schema_version
+from app.server import server_options, sse_stream_limit
+from app.tenants import TenantEngines
+from datetime import datetime, timedelta
+import gzip
+import json
+import os
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.exc import OperationalError
 
 @pytest.fixture
 def app():
@@ -454,6 +465,1234 @@ def test_task_ids_are_integers(client):
     assert isinstance(t1["id"], int)
     assert isinstance(t2["id"], int)
 
+# Teste 31: Paginação por cursor percorre todas as tarefas sem repetir
+def test_list_tasks_cursor_pagination(client):
+    client.delete("/tasks/clear")
+    for i in range(5):
+        client.post("/tasks/", json={
+            "description": f"T{i}", "category": "Pessoal", "deadline": f"2025-12-{10 + i}"
+        })
+
+    first = client.get("/tasks/?limit=2").get_json()
+    assert [t["description"] for t in first["tasks"]] == ["T0", "T1"]
+    assert first["next_cursor"]
+
+    seen = [t["id"] for t in first["tasks"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        page = client.get(f"/tasks/?limit=2&cursor={cursor}").get_json()
+        seen.extend(t["id"] for t in page["tasks"])
+        cursor = page["next_cursor"]
+
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+
+# Teste 32: Paginação respeita o filtro de concluídas e desempata por id
+def test_list_tasks_cursor_pagination_with_filter(client):
+    client.delete("/tasks/clear")
+    ids = [client.post("/tasks/", json={
+        "description": f"T{i}", "category": "Pessoal", "deadline": "2025-12-31"
+    }).get_json()["id"] for i in range(3)]
+    for task_id in ids:
+        client.patch(f"/tasks/{task_id}/complete")
+
+    page = client.get("/tasks/?completed=true&limit=2").get_json()
+    assert [t["id"] for t in page["tasks"]] == ids[:2]
+    page = client.get(f"/tasks/?completed=true&limit=2&cursor={page['next_cursor']}").get_json()
+    assert [t["id"] for t in page["tasks"]] == ids[2:]
+    assert page["next_cursor"] is None
+
+# Teste 33: Cursor ou limite inválidos retornam 400
+def test_list_tasks_invalid_cursor_or_limit(client):
+    assert client.get("/tasks/?cursor=invalido").status_code == 400
+    assert client.get("/tasks/?limit=abc").status_code == 400
+    assert client.get("/tasks/?limit=0").status_code == 400
+
+# Teste 34: Criação em lote insere todas as tarefas válidas
+def test_add_tasks_batch(client):
+    client.delete("/tasks/clear")
+    payload = [
+        {"description": f"Lote {i}", "category": "Casa", "deadline": "2025-12-31"}
+        for i in range(3)
+    ]
+    response = client.post("/tasks/batch", json=payload)
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data["created"] == 3
+    assert [r["task"]["description"] for r in data["results"]] == ["Lote 0", "Lote 1", "Lote 2"]
+    assert len({r["task"]["id"] for r in data["results"]}) == 3
+    assert len(client.get("/tasks/").get_json()) == 3
+
+# Teste 35: Criação em lote reporta erros por item
+def test_add_tasks_batch_reports_item_errors(client):
+    client.delete("/tasks/clear")
+    payload = {"tasks": [
+        {"description": "Válida", "category": "Pessoal", "deadline": "2025-12-31"},
+        {"description": "Categoria ruim", "category": "Lazer"},
+        {"category": "Pessoal"},
+        {"description": "Prazo ruim", "category": "Pessoal", "deadline": "31/12/2025"},
+    ]}
+    response = client.post("/tasks/batch", json=payload)
+    assert response.status_code == 207
+    results = response.get_json()["results"]
+    assert [r["status"] for r in results] == ["created", "error", "error", "error"]
+    assert results[1]["error"] == "Categoria inválida"
+    assert results[2]["error"] == "Description is required"
+    assert results[3]["error"] == "Prazo inválido"
+    assert len(client.get("/tasks/").get_json()) == 1
+
+# Teste 36: Inserção em blocos respeita o tamanho configurado
+def test_add_tasks_in_chunks(app):
+    with app.app_context():
+        manager = TaskManager(db)
+        items = [{"description": f"T{i}", "category": "Pessoal"} for i in range(5)]
+        results = manager.add_tasks(items, chunk_size=2)
+        assert all(r["status"] == "created" for r in results)
+        assert len(manager.get_tasks()) == 5
+
+# Teste 37: Lote vazio ou inválido retorna 400
+def test_add_tasks_batch_empty(client):
+    assert client.post("/tasks/batch", json=[]).status_code == 400
+    response = client.post("/tasks/batch", json=[{"description": "X", "category": "Lazer"}])
+    assert response.status_code == 400
+
+# Teste 38: Concluir várias tarefas por id em uma única operação
+def test_complete_tasks_by_ids(client):
+    client.delete("/tasks/clear")
+    ids = [client.post("/tasks/", json={
+        "description": f"T{i}", "category": "Pessoal", "deadline": "2025-12-31"
+    }).get_json()["id"] for i in range(3)]
+
+    response = client.patch("/tasks/complete", json={"ids": ids[:2]})
+    assert response.status_code == 200
+    assert response.get_json() == {"completed": ids[:2], "count": 2}
+
+    pending = client.get("/tasks/?completed=false").get_json()
+    assert [t["id"] for t in pending] == [ids[2]]
+
+    # Tarefas já concluídas não são reportadas de novo
+    again = client.patch("/tasks/complete", json={"ids": ids})
+    assert again.get_json()["completed"] == [ids[2]]
+
+# Teste 39: Remover tarefas por filtro de categoria e prazo
+def test_delete_tasks_by_filter(client):
+    client.delete("/tasks/clear")
+    old = client.post("/tasks/", json={
+        "description": "Antiga", "category": "Casa", "deadline": "2025-01-10"
+    }).get_json()
+    client.post("/tasks/", json={
+        "description": "Nova", "category": "Casa", "deadline": "2025-12-31"
+    })
+    client.post("/tasks/", json={
+        "description": "Outra", "category": "Pessoal", "deadline": "2025-01-10"
+    })
+
+    response = client.delete("/tasks/", json={"category": "Casa", "deadline_before": "2025-06-01"})
+    assert response.status_code == 200
+    assert response.get_json() == {"deleted": [old["id"]], "count": 1}
+    assert {t["description"] for t in client.get("/tasks/").get_json()} == {"Nova", "Outra"}
+
+# Teste 40: Operações em massa exigem critério válido
+def test_bulk_operations_require_valid_criteria(client):
+    assert client.delete("/tasks/", json={}).status_code == 400
+    assert client.patch("/tasks/complete", json={"ids": "1,2"}).status_code == 400
+    assert client.patch("/tasks/complete", json={"category": "Lazer"}).status_code == 400
+    assert client.delete("/tasks/", json={"deadline_before": "ontem"}).status_code == 400
+
+# Teste 41: Exportação NDJSON envia uma tarefa por linha
+def test_export_tasks_ndjson(client):
+    client.delete("/tasks/clear")
+    for i in range(3):
+        client.post("/tasks/", json={
+            "description": f"T{i}", "category": "Pessoal", "deadline": f"2025-12-{20 + i}"
+        })
+    client.patch("/tasks/1/complete")
+
+    response = client.get("/tasks/export?format=ndjson")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines == client.get("/tasks/").get_json()
+
+    pending = client.get("/tasks/export?completed=false").get_data(as_text=True).splitlines()
+    assert len(pending) == 2
+
+# Teste 42: Exportação em JSON produz um array válido
+def test_export_tasks_json(client):
+    client.delete("/tasks/clear")
+    assert client.get("/tasks/export?format=json").get_json() == []
+    client.post("/tasks/", json={"description": "T", "category": "Casa", "deadline": "2025-12-31"})
+    client.post("/tasks/", json={"description": "U", "category": "Casa", "deadline": "2025-12-30"})
+    exported = client.get("/tasks/export?format=json").get_json()
+    assert [t["description"] for t in exported] == ["U", "T"]
+    assert client.get("/tasks/export?format=xml").status_code == 400
+
+# Teste 43: Listagem retorna 304 quando nada mudou
+def test_list_tasks_etag_not_modified(client):
+    client.delete("/tasks/clear")
+    client.post("/tasks/", json={"description": "T", "category": "Casa", "deadline": "2025-12-31"})
+
+    first = client.get("/tasks/")
+    etag = first.headers["ETag"]
+    assert etag
+
+    cached = client.get("/tasks/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+
+    # Filtros diferentes geram ETags diferentes
+    assert client.get("/tasks/?completed=true").headers["ETag"] != etag
+
+# Teste 44: Cada alteração invalida o ETag da listagem
+def test_list_tasks_etag_changes_after_mutations(client):
+    client.delete("/tasks/clear")
+    etag = client.get("/tasks/").headers["ETag"]
+    task = client.post("/tasks/", json={
+        "description": "T", "category": "Casa", "deadline": "2025-12-31"
+    }).get_json()
+
+    mutations = [
+        lambda: client.put(f"/tasks/{task['id']}", json={"description": "U"}),
+        lambda: client.patch(f"/tasks/{task['id']}/complete"),
+        lambda: client.delete(f"/tasks/{task['id']}"),
+        lambda: client.delete("/tasks/clear"),
+    ]
+    for mutate in mutations:
+        mutate()
+        response = client.get("/tasks/", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+# Teste 45: Versão de alterações é persistida e incrementada
+def test_change_version_is_bumped(app):
+    with app.app_context():
+        manager = TaskManager(db)
+        assert manager.current_version() == 0
+        manager.add_task("T", "Casa", "2025-12-31")
+        manager.add_tasks([{"description": "U", "category": "Casa"}])
+        assert manager.current_version() == 2
+        # Operações em massa sem linhas afetadas não mudam a versão
+        manager.complete_tasks(ids=[999])
+        assert manager.current_version() == 2
+
+# Teste 46: Perfil de produção aplica WAL e pragmas em cada conexão
+def test_production_profile_sqlite_pragmas(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'prod.db'}")
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "1234")
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    prod_app = create_app("production")
+
+    assert prod_app.config["SQLALCHEMY_ENGINE_OPTIONS"]["pool_size"] == 3
+    with prod_app.app_context():
+        assert db.engine.pool.size() == 3
+        with db.engine.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 1234
+            assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        db.engine.dispose()
+
+# Teste 47: Listagem sem ORM mantém o mesmo formato de Task.to_dict
+def test_list_tasks_matches_to_dict(app, client):
+    client.delete("/tasks/clear")
+    client.post("/tasks/", json={"description": "T", "category": "Casa", "deadline": "2025-12-31"})
+    client.post("/tasks/batch", json=[{"description": "Sem prazo", "category": "Pessoal"}])
+    client.patch("/tasks/1/complete")
+
+    with app.test_request_context():
+        expected = [task.to_dict() for task in TaskManager(db).get_tasks()]
+        expected_body = app.json.response(expected).data
+    assert client.get("/tasks/").data == expected_body
+
+# Teste 48: Campos esparsos retornam apenas o subconjunto pedido
+def test_list_tasks_sparse_fields(client):
+    client.delete("/tasks/clear")
+    client.post("/tasks/", json={"description": "T", "category": "Casa", "deadline": "2025-12-31"})
+
+    tasks = client.get("/tasks/?fields=id,description,completed").get_json()
+    assert tasks == [{"id": 1, "description": "T", "completed": False}]
+
+    page = client.get("/tasks/?fields=description&limit=1").get_json()
+    assert page["tasks"] == [{"description": "T"}]
+
+    exported = client.get("/tasks/export?fields=deadline").get_data(as_text=True)
+    assert json.loads(exported) == {"deadline": "2025-12-31"}
+
+    assert client.get("/tasks/?fields=id,senha").status_code == 400
+
+# Teste 49: Busca textual encontra tarefas por termo e por prefixo
+def test_search_tasks(client):
+    client.delete("/tasks/clear")
+    client.post("/tasks/batch", json=[
+        {"description": "Estudar Python", "category": "Pessoal"},
+        {"description": "Revisar testes de Python", "category": "Trabalho"},
+        {"description": "Consulta de saúde", "category": "Saúde"},
+    ])
+
+    response = client.get("/tasks/search?q=python")
+    assert response.status_code == 200
+    assert {t["description"] for t in response.get_json()["tasks"]} == {
+        "Estudar Python", "Revisar testes de Python"
+    }
+
+    prefix = client.get("/tasks/search?q=estu*").get_json()["tasks"]
+    assert [t["description"] for t in prefix] == ["Estudar Python"]
+
+    # Acentos são ignorados na busca
+    accents = client.get("/tasks/search?q=saude").get_json()["tasks"]
+    assert [t["description"] for t in accents] == ["Consulta de saúde"]
+
+# Teste 50: Busca combina filtros, paginação e acompanha edições e remoções
+def test_search_tasks_filters_and_sync(client):
+    client.delete("/tasks/clear")
+    ids = [r["task"]["id"] for r in client.post("/tasks/batch", json=[
+        {"description": f"Relatório {i}", "category": "Trabalho"} for i in range(3)
+    ]).get_json()["results"]]
+    client.patch(f"/tasks/{ids[0]}/complete")
+
+    pending = client.get("/tasks/search?q=relatorio&completed=false").get_json()
+    assert {t["id"] for t in pending["tasks"]} == set(ids[1:])
+    assert client.get("/tasks/search?q=relatorio&category=Casa").get_json()["tasks"] == []
+
+    page = client.get("/tasks/search?q=relatorio&limit=2").get_json()
+    assert len(page["tasks"]) == 2 and page["next_offset"] == 2
+    rest = client.get("/tasks/search?q=relatorio&limit=2&offset=2").get_json()
+    assert len(rest["tasks"]) == 1 and rest["next_offset"] is None
+
+    client.put(f"/tasks/{ids[1]}", json={"description": "Planilha"})
+    client.delete(f"/tasks/{ids[2]}")
+    assert [t["id"] for t in client.get("/tasks/search?q=relatorio").get_json()["tasks"]] == [ids[0]]
+    assert [t["id"] for t in client.get("/tasks/search?q=planilha").get_json()["tasks"]] == [ids[1]]
+
+    client.delete("/tasks/clear")
+    assert client.get("/tasks/search?q=planilha").get_json()["tasks"] == []
+
+# Teste 51: Consulta de busca vazia ou inválida retorna 400
+def test_search_tasks_invalid_query(client):
+    assert client.get("/tasks/search").status_code == 400
+    assert client.get("/tasks/search?q=%22%22").status_code == 400
+    assert client.get("/tasks/search?q=x&category=Lazer").status_code == 400
+
+# Teste 52: Estatísticas acompanham todas as formas de alteração
+def test_task_stats_counters(client):
+    client.delete("/tasks/clear")
+    ids = [r["task"]["id"] for r in client.post("/tasks/batch", json=[
+        {"description": "A", "category": "Casa"},
+        {"description": "B", "category": "Casa"},
+        {"description": "C", "category": "Trabalho"},
+        {"description": "D", "category": "Pessoal"},
+    ]).get_json()["results"]]
+    client.post("/tasks/", json={"description": "E", "category": "Saúde", "deadline": "2025-12-31"})
+    client.patch(f"/tasks/{ids[0]}/complete")
+    client.patch("/tasks/complete", json={"ids": [ids[2]]})
+    client.put(f"/tasks/{ids[1]}", json={"category": "Finanças"})
+    client.delete(f"/tasks/{ids[3]}")
+
+    stats = client.get("/tasks/stats").get_json()
+    assert stats["by_category"]["Casa"] == {"pending": 0, "completed": 1}
+    assert stats["by_category"]["Finanças"] == {"pending": 1, "completed": 0}
+    assert stats["by_category"]["Trabalho"] == {"pending": 0, "completed": 1}
+    assert stats["by_category"]["Pessoal"] == {"pending": 0, "completed": 0}
+    assert stats["by_category"]["Saúde"] == {"pending": 1, "completed": 0}
+    assert (stats["pending"], stats["completed"], stats["total"]) == (2, 2, 4)
+
+    client.delete("/tasks/clear")
+    assert client.get("/tasks/stats").get_json()["total"] == 0
+
+# Teste 53: Estatísticas contam tarefas pendentes atrasadas e da semana
+def test_task_stats_deadlines(app):
+    with app.app_context():
+        manager = TaskManager(db)
+        manager.add_tasks([
+            {"description": "Atrasada", "category": "Casa", "deadline": "2025-03-01"},
+            {"description": "Hoje", "category": "Casa", "deadline": "2025-03-05"},
+            {"description": "Domingo", "category": "Casa", "deadline": "2025-03-09"},
+            {"description": "Próxima semana", "category": "Casa", "deadline": "2025-03-10"},
+            {"description": "Concluída", "category": "Casa", "deadline": "2025-03-02"},
+        ])
+        manager.complete_tasks(ids=[5])
+        stats = manager.get_stats(today=datetime(2025, 3, 5))  # quarta-feira
+        assert stats["overdue"] == 1
+        assert stats["due_this_week"] == 2
+
+# Teste 54: Alterações publicam eventos somente após o commit
+def test_task_events_published_after_commit(app):
+    subscription = broker.subscribe()
+    try:
+        with app.app_context():
+            manager = TaskManager(db)
+            task = manager.add_task("T", "Casa", "2025-12-31")
+            manager.mark_completed(task["id"])
+            manager.add_tasks([{"description": "U", "category": "Casa"}])
+            manager.delete_tasks(ids=[2])
+            manager.delete_all()
+
+        events = []
+        while not subscription.empty():
+            events.append(subscription.get_nowait())
+        assert [e["type"] for e in events] == ["created", "updated", "created", "deleted", "cleared"]
+        assert events[0]["task"] == task
+        assert events[1]["task"]["completed"] is True
+        assert events[3]["id"] == 2
+        assert [e["version"] for e in events] == [1, 2, 3, 4, 5]
+    finally:
+        broker.unsubscribe(subscription)
+
+# Teste 55: Stream SSE entrega os eventos aos clientes conectados
+def test_task_events_stream(client):
+    response = client.get("/tasks/events")
+    assert response.mimetype == "text/event-stream"
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b": connected")
+
+    created = client.post("/tasks/", json={
+        "description": "T", "category": "Casa", "deadline": "2025-12-31"
+    }).get_json()
+    chunk = next(chunks).decode()
+    assert chunk.startswith("data: ")
+    event = json.loads(chunk[len("data: "):])
+    assert event["type"] == "created"
+    assert event["task"] == created
+    response.close()
+
+# Teste 56: Sincronização incremental retorna só o que mudou desde a versão
+def test_list_tasks_since_version(client):
+    client.delete("/tasks/clear")
+    t1 = client.post("/tasks/", json={"description": "T1", "category": "Casa", "deadline": "2025-12-31"}).get_json()
+    t2 = client.post("/tasks/", json={"description": "T2", "category": "Casa", "deadline": "2025-12-31"}).get_json()
+    t3 = client.post("/tasks/", json={"description": "T3", "category": "Casa", "deadline": "2025-12-31"}).get_json()
+
+    snapshot = client.get("/tasks/?since=0").get_json()
+    assert [t["id"] for t in snapshot["tasks"]] == [t1["id"], t2["id"], t3["id"]]
+    assert snapshot["deleted"] == []
+    version = snapshot["version"]
+
+    client.patch(f"/tasks/{t2['id']}/complete")
+    client.delete(f"/tasks/{t3['id']}")
+
+    changes = client.get(f"/tasks/?since={version}").get_json()
+    assert [(t["id"], t["completed"]) for t in changes["tasks"]] == [(t2["id"], True)]
+    assert changes["deleted"] == [t3["id"]]
+    assert changes["version"] == version + 2
+
+    empty = client.get(f"/tasks/?since={changes['version']}").get_json()
+    assert empty["tasks"] == [] and empty["deleted"] == []
+    assert client.get("/tasks/?since=abc").status_code == 400
+
+# Teste 57: Remoções em massa geram registros de exclusão; a limpeza pede resync
+def test_list_tasks_since_bulk_deletions(app, client):
+    client.delete("/tasks/clear")
+    ids = [r["task"]["id"] for r in client.post("/tasks/batch", json=[
+        {"description": f"T{i}", "category": "Casa"} for i in range(4)
+    ]).get_json()["results"]]
+    version = client.get("/tasks/?since=0").get_json()["version"]
+
+    client.delete("/tasks/", json={"ids": ids[:2]})
+    changes = client.get(f"/tasks/?since={version}").get_json()
+    assert changes["deleted"] == ids[:2]
+
+    assert changes["resync"] is False
+
+    # A limpeza não grava um tombstone por tarefa: versões anteriores a ela
+    # recebem a lista completa com "resync"
+    client.delete("/tasks/clear")
+    with app.app_context():
+        assert db.session.execute(db.text("SELECT count(*) FROM task_tombstone")).scalar() == 0
+    changes = client.get(f"/tasks/?since={changes['version']}").get_json()
+    assert changes["resync"] is True
+    assert changes["tasks"] == [] and changes["deleted"] == []
+
+    new = client.post("/tasks/", json={"description": "N", "category": "Casa", "deadline": "2025-12-31"}).get_json()
+    changes = client.get(f"/tasks/?since={version}").get_json()
+    assert changes["resync"] is True
+    assert [t["id"] for t in changes["tasks"]] == [new["id"]]
+    after = client.get(f"/tasks/?since={changes['version'] - 1}").get_json()
+    assert after["resync"] is False and [t["id"] for t in after["tasks"]] == [new["id"]]
+
+# Teste 58: /metrics expõe latência, comandos SQL e tamanho das respostas
+def test_metrics_endpoint(client):
+    client.post("/tasks/", json={"description": "T", "category": "Casa", "deadline": "2025-12-31"})
+    client.get("/tasks/")
+    client.get("/tasks/")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'http_requests_total{method="GET",endpoint="/tasks/",status="200"} 2' in body
+    assert 'http_request_duration_seconds_count{method="POST",endpoint="/tasks/"} 1' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",endpoint="/tasks/",le="+Inf"} 2' in body
+
+    queries = [line for line in body.splitlines()
+               if line.startswith('db_queries_total{method="GET",endpoint="/tasks/"}')]
+    assert int(queries[0].split()[-1]) >= 2
+    sizes = [line for line in body.splitlines()
+             if line.startswith('http_response_size_bytes_total{method="GET",endpoint="/tasks/"}')]
+    assert int(sizes[0].split()[-1]) > 0
+
+# Teste 59: Requisições lentas são registradas com os comandos SQL executados
+def test_slow_request_log(app, client, caplog):
+    client.get("/tasks/")
+    assert "Requisição lenta" not in caplog.text
+
+    app.config["SLOW_REQUEST_MS"] = 0
+    with caplog.at_level("WARNING"):
+        client.get("/tasks/")
+    assert "Requisição lenta: GET /tasks/?" in caplog.text
+    assert "SELECT" in caplog.text
+
+# Teste 60: Group commit agrupa escritas concorrentes e isola erros por operação
+def test_group_commit_batches_concurrent_writes(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'group.db'}")
+    monkeypatch.setenv("GROUP_COMMIT", "1")
+    monkeypatch.setenv("GROUP_COMMIT_WINDOW_MS", "20")
+    group_app = create_app("production")
+    writer = group_app.extensions["group_commit"]
+    client = group_app.test_client()
+
+    def add(i):
+        return client.post("/tasks/", json={
+            "description": f"T{i}", "category": "Casa", "deadline": "2025-12-31"
+        })
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(add, range(16)))
+    assert all(r.status_code == 201 for r in responses)
+    assert len({r.get_json()["id"] for r in responses}) == 16
+
+    task_id = responses[0].get_json()["id"]
+    edited = client.put(f"/tasks/{task_id}", json={"description": "Editada"})
+    assert edited.get_json()["description"] == "Editada"
+    assert client.patch(f"/tasks/{task_id}/complete").get_json()["completed"] is True
+    assert client.patch("/tasks/999/complete").status_code == 404
+
+    # Uma operação com erro não desfaz as demais do mesmo lote
+    with group_app.app_context():
+        manager = TaskManager(db)
+        with pytest.raises(ValueError):
+            manager.add_task("Ruim", "Casa", "31/12/2025")
+        manager.add_task("Boa", "Casa", "2025-12-31")
+        assert len(manager.get_tasks()) == 17
+        assert manager.current_version() == 19
+
+    writer.close()
+    with group_app.app_context():
+        db.engine.dispose()
+
+# Teste 61: Filtro por uma ou várias categorias na listagem
+def test_list_tasks_category_filter(client):
+    client.delete("/tasks/clear")
+    client.post("/tasks/batch", json=[
+        {"description": "A", "category": "Casa", "deadline": "2025-12-01"},
+        {"description": "B", "category": "Pessoal", "deadline": "2025-12-02"},
+        {"description": "C", "category": "Trabalho", "deadline": "2025-12-03"},
+        {"description": "D", "category": "Casa", "deadline": "2025-12-04"},
+    ])
+    client.patch("/tasks/4/complete")
+
+    casa = client.get("/tasks/?category=Casa").get_json()
+    assert [t["description"] for t in casa] == ["A", "D"]
+    assert all(t["category"] == "Casa" for t in casa)
+
+    several = client.get("/tasks/?category=Casa&category=Trabalho&completed=false").get_json()
+    assert [t["description"] for t in several] == ["A", "C"]
+    assert client.get("/tasks/?category=Pessoal,Trabalho").get_json()[0]["description"] == "B"
+
+    page = client.get("/tasks/?category=Casa&limit=1").get_json()
+    assert [t["description"] for t in page["tasks"]] == ["A"]
+    assert client.get("/tasks/?category=Lazer").status_code == 400
+
+# Teste 62: Categorias são gravadas como códigos inteiros da tabela category
+def test_categories_stored_as_integer_codes(app):
+    with app.app_context():
+        task = TaskManager(db).add_task("T", "Saúde", "2025-12-31")
+        stored = db.session.execute(
+            db.text("SELECT t.category_id, c.name FROM task t JOIN category c ON c.id = t.category_id")
+        ).one()
+        assert stored == (TaskManager.CATEGORIES.index("Saúde") + 1, "Saúde")
+        assert task["category"] == "Saúde"
+
+# Teste 63: Filtros de prazo e de tarefas atrasadas
+def test_list_tasks_deadline_filters(client):
+    client.delete("/tasks/clear")
+    client.post("/tasks/batch", json=[
+        {"description": "Passada", "category": "Casa", "deadline": "2020-01-10"},
+        {"description": "Passada concluída", "category": "Casa", "deadline": "2020-01-11"},
+        {"description": "Futura", "category": "Casa", "deadline": "2999-01-10"},
+        {"description": "Sem prazo", "category": "Casa"},
+    ])
+    client.patch("/tasks/2/complete")
+
+    before = client.get("/tasks/?due_before=2020-01-11").get_json()
+    assert [t["description"] for t in before] == ["Passada"]
+    after = client.get("/tasks/?due_after=2020-01-10").get_json()
+    assert [t["description"] for t in after] == ["Passada concluída", "Futura"]
+    window = client.get("/tasks/?due_after=2020-01-01&due_before=2021-01-01&completed=false").get_json()
+    assert [t["description"] for t in window] == ["Passada"]
+
+    overdue = client.get("/tasks/?overdue=true").get_json()
+    assert [t["description"] for t in overdue] == ["Passada"]
+    exported = client.get("/tasks/export?overdue=true").get_data(as_text=True).splitlines()
+    assert len(exported) == 1
+
+    assert client.get("/tasks/?due_before=amanha").status_code == 400
+
+# Teste 64: Consulta de pendentes por prazo usa o índice parcial
+def test_pending_deadline_query_uses_partial_index(app):
+    with app.app_context():
+        statement = TaskManager(db)._select_rows(
+            ("id", "deadline"), completed=False, due_before=datetime(2025, 1, 1)
+        )
+        compiled = statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+        plan = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+        assert "ix_task_pending_deadline" in " ".join(row[-1] for row in plan)
+
+        completed = TaskManager(db)._select_rows(("id",), completed=True)
+        compiled = completed.compile(db.engine, compile_kwargs={"literal_binds": True})
+        plan = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+        assert "ix_task_completed_deadline" in " ".join(row[-1] for row in plan)
+
+# Teste 65: Migrações atualizam um banco no formato antigo sem perder dados
+def test_migrations_upgrade_legacy_database(tmp_path, monkeypatch):
+    path = tmp_path / "legacy.db"
+    legacy = sqlite3.connect(path)
+    legacy.executescript("""
+        CREATE TABLE task (
+            id INTEGER NOT NULL PRIMARY KEY, description TEXT, category VARCHAR(50),
+            deadline DATETIME, completed BOOLEAN, created_at DATETIME
+        );
+        INSERT INTO task VALUES (1, 'Pagar contas', 'Finanças', '2025-12-31 00:00:00.000000', 0,
+                                 '2025-01-01 10:00:00.000000');
+        INSERT INTO task VALUES (2, 'Limpar a casa', 'Casa', NULL, 1, '2025-01-02 10:00:00.000000');
+    """)
+    legacy.commit()
+    legacy.close()
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{path}")
+    upgraded = create_app("production")
+    assert upgraded.extensions["startup"]["migrations_applied"] == len(MIGRATIONS)
+    client = upgraded.test_client()
+
+    tasks = client.get("/tasks/").get_json()
+    assert [(t["description"], t["category"], t["completed"]) for t in tasks] == [
+        ("Limpar a casa", "Casa", True), ("Pagar contas", "Finanças", False)
+    ]
+    assert tasks[1]["created_at"] == "2025-01-01 10:00:00"
+    assert client.get("/tasks/search?q=contas").get_json()["tasks"][0]["id"] == 1
+    stats = client.get("/tasks/stats").get_json()
+    assert stats["by_category"]["Casa"] == {"pending": 0, "completed": 1}
+    assert client.post("/tasks/", json={
+        "description": "Nova", "category": "Casa", "deadline": "2025-12-31"
+    }).status_code == 201
+
+    with upgraded.app_context():
+        with db.engine.connect() as connection:
+            assert schema_version(connection) == len(MIGRATIONS)
+            # Tabela recriada com AUTOINCREMENT, mantendo os ids
+            assert "AUTOINCREMENT" in connection.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE name = 'task'"
+            ).scalar()
+        db.engine.dispose()
+
+    # Com o esquema em dia, a inicialização não aplica nada
+    again = create_app("production")
+    assert again.extensions["startup"]["migrations_applied"] == 0
+    assert "app_startup_seconds" in again.test_client().get("/metrics").get_data(as_text=True)
+    with again.app_context():
+        db.engine.dispose()
+
+# Teste 66: Endpoints de liveness e readiness
+def test_health_endpoints(client):
+    assert client.get("/healthz").get_json() == {"status": "ok"}
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.get_json() == {"status": "ready"}
+
+# Teste 67: Configuração do servidor de produção vem do ambiente
+def test_production_server_options():
+    options = server_options({"WEB_CONCURRENCY": "3", "GUNICORN_THREADS": "8", "BIND": "127.0.0.1:9000"})
+    assert options["workers"] == 3
+    assert options["threads"] == 8
+    assert options["bind"] == "127.0.0.1:9000"
+    assert options["worker_class"] == "gthread"
+    assert options["preload_app"] is False
+    assert server_options({"GUNICORN_WORKER_CLASS": "gevent"})["worker_class"] == "gevent"
+    # Streams SSE limitados a metade das threads; sem limite com gevent
+    assert sse_stream_limit({"GUNICORN_THREADS": "8"}) == 4
+    assert sse_stream_limit({"GUNICORN_WORKER_CLASS": "gevent"}) == 0
+    assert sse_stream_limit({"SSE_MAX_STREAMS": "10"}) == 10
+
+
+# Teste 68: Edição, conclusão e remoção sem SELECT prévio da tarefa
+def test_single_statement_mutations(app, client):
+    task = client.post("/tasks/", json={"description": "Uma", "category": "Casa", "deadline": "2025-01-01"}).get_json()
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    db.event.listen(engine, "before_cursor_execute", record)
+    try:
+        edited = client.put(f"/tasks/{task['id']}", json={"description": "Editada"}).get_json()
+        completed = client.patch(f"/tasks/{task['id']}/complete").get_json()
+        deleted = client.delete(f"/tasks/{task['id']}").get_json()
+        missing = client.delete(f"/tasks/{task['id']}").get_json()
+    finally:
+        db.event.remove(engine, "before_cursor_execute", record)
+    assert not any(statement.lstrip().upper().startswith("SELECT") for statement in statements)
+    assert edited == {**task, "description": "Editada"}
+    assert completed == {**task, "description": "Editada", "completed": True}
+    assert deleted["deleted"] is True
+    assert missing["deleted"] is False
+
+# Teste 69: Caminho alternativo para SQLite sem RETURNING (anterior ao 3.35)
+def test_mutations_without_returning(app, client, monkeypatch):
+    # Com as flags do dialeto desligadas, qualquer RETURNING falha ao compilar
+    with app.app_context():
+        dialect = db.engine.dialect
+    for flag in ("insert_returning", "update_returning", "delete_returning"):
+        monkeypatch.setattr(dialect, flag, False)
+    task = client.post("/tasks/", json={"description": "Uma", "category": "Casa", "deadline": "2025-01-01"}).get_json()
+    version = client.get("/tasks/?since=0").get_json()["version"]
+    edited = client.put(f"/tasks/{task['id']}", json={"category": "Pessoal", "deadline": "2025-02-01"})
+    assert edited.get_json() == {**task, "category": "Pessoal", "deadline": "2025-02-01"}
+    assert client.patch(f"/tasks/{task['id']}/complete").get_json()["completed"] is True
+    assert client.put("/tasks/999", json={"description": "X"}).status_code == 404
+    assert client.delete(f"/tasks/{task['id']}").get_json()["deleted"] is True
+    assert client.delete(f"/tasks/{task['id']}").get_json()["deleted"] is False
+    changes = client.get(f"/tasks/?since={version}").get_json()
+    assert changes["version"] == version + 3
+    assert changes["deleted"] == [task["id"]]
+
+    # Operações em lote
+    results = client.post("/tasks/batch", json=[
+        {"description": f"L{i}", "category": "Casa", "deadline": "2025-03-01"} for i in range(4)
+    ]).get_json()["results"]
+    ids = [result["task"]["id"] for result in results]
+    assert len(set(ids)) == 4 and [result["task"]["description"] for result in results] == ["L0", "L1", "L2", "L3"]
+    completed = client.patch("/tasks/complete", json={"ids": ids[:3]}).get_json()
+    assert completed["completed"] == ids[:3]
+    assert client.patch("/tasks/complete", json={"ids": ids[:3]}).get_json()["completed"] == []
+    deleted = client.delete("/tasks/", json={"ids": ids[1:]}).get_json()
+    assert deleted["deleted"] == ids[1:]
+    remaining = client.get("/tasks/").get_json()
+    assert [(t["id"], t["completed"]) for t in remaining] == [(ids[0], True)]
+
+# Teste 70: Cada tenant tem o próprio banco, pelo cabeçalho ou pelo prefixo
+def test_tenant_routing(tmp_path, monkeypatch, client):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'main.db'}")
+    monkeypatch.setenv("TENANT_DB_DIR", str(tmp_path / "tenants"))
+    tenant_app = create_app('production')
+    tenant_client = tenant_app.test_client()
+    task = {"description": "Tarefa", "category": "Casa", "deadline": "2025-01-01"}
+    runner = tenant_app.test_cli_runner()
+    for name in ("acme", "globex"):
+        assert "criado" in runner.invoke(args=["tenant", "create", name]).output
+
+    tenant_client.post("/tasks/", json=task, headers={"X-Tenant": "acme"})
+    tenant_client.post("/t/acme/tasks/", json=task)
+    tenant_client.post("/t/globex/tasks/", json=task)
+    tenant_client.post("/tasks/", json=task)
+
+    assert len(tenant_client.get("/t/acme/tasks/").get_json()) == 2
+    assert len(tenant_client.get("/tasks/", headers={"X-Tenant": "globex"}).get_json()) == 1
+    assert len(tenant_client.get("/tasks/").get_json()) == 1
+    assert (tmp_path / "tenants" / "acme.db").exists()
+    assert tenant_client.get("/t/acme/tasks/").headers["ETag"] != tenant_client.get("/t/globex/tasks/").headers["ETag"]
+
+    # delete_all só limpa o tenant da requisição
+    tenant_client.delete("/t/acme/tasks/clear")
+    assert tenant_client.get("/t/acme/tasks/").get_json() == []
+    assert len(tenant_client.get("/t/globex/tasks/").get_json()) == 1
+    assert len(tenant_client.get("/tasks/").get_json()) == 1
+
+    assert tenant_client.get("/tasks/", headers={"X-Tenant": "../main"}).status_code == 400
+    # Tenants não criados não ganham um banco novo
+    unknown = tenant_client.post("/t/initech/tasks/", json=task)
+    assert unknown.status_code == 404 and unknown.get_json() == {"error": "Tenant não encontrado"}
+    assert tenant_client.get("/tasks/", headers={"X-Tenant": "initech"}).status_code == 404
+    assert not (tmp_path / "tenants" / "initech.db").exists()
+    # Sem TENANT_DB_DIR o cabeçalho é recusado em vez de cair no banco principal
+    assert client.get("/tasks/", headers={"X-Tenant": "acme"}).status_code == 400
+    tenant_app.extensions['tenants'].dispose_all()
+    with tenant_app.app_context():
+        db.engine.dispose()
+
+# Teste 71: Cache de engines por tenant descarta os menos usados e os ociosos
+def test_tenant_engine_cache_eviction(tmp_path):
+    engines = TenantEngines(str(tmp_path), db.metadata, max_open=2, idle_seconds=300)
+    first = engines.create("a")
+    engines.create("b")
+    assert engines.engine("a") is first
+    engines.create("c")
+    assert engines.open_tenants() == ["a", "c"]
+    # Fechado pelo LRU, o tenant continua existindo no disco
+    assert engines.exists("b") and engines.engine("b") is not None
+    engines.idle_seconds = 0
+    engines.create("d")
+    assert engines.open_tenants() == []
+    with pytest.raises(ValueError):
+        engines.engine("A B")
+    with pytest.raises(LookupError):
+        engines.engine("e")
+    assert not engines.exists("e")
+
+    # Engines ociosos são fechados pela varredura, sem novos acessos
+    engines.idle_seconds = 300
+    engines.create("f")
+    engines.idle_seconds = 0
+    assert engines.sweep() == 1 and engines.open_tenants() == []
+    engines.dispose_all()
+
+# Teste 72: Eventos de um tenant não chegam aos assinantes de outro
+def test_tenant_event_channels(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'main.db'}")
+    monkeypatch.setenv("TENANT_DB_DIR", str(tmp_path / "tenants"))
+    tenant_app = create_app('production')
+    tenant_client = tenant_app.test_client()
+    tenant_app.extensions['tenants'].create("acme")
+    acme = broker.subscribe("acme")
+    main = broker.subscribe()
+    try:
+        tenant_client.post("/t/acme/tasks/", json={"description": "A", "category": "Casa", "deadline": "2025-01-01"})
+        assert acme.get_nowait()["type"] == "created"
+        assert main.empty()
+    finally:
+        broker.unsubscribe(acme, "acme")
+        broker.unsubscribe(main)
+        tenant_app.extensions['tenants'].dispose_all()
+        with tenant_app.app_context():
+            db.engine.dispose()
+
+# Teste 73: Frontend com nomes por hash, compressão e cache imutável
+def test_fingerprinted_compressed_assets(app, client):
+    index = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert index.headers["Cache-Control"] == "no-cache"
+    script_name = re.search(r'src="(script\.[0-9a-f]{12}\.js)"', index.get_data(as_text=True)).group(1)
+    assert re.search(r'href="style\.[0-9a-f]{12}\.css"', index.get_data(as_text=True))
+
+    with open(os.path.join(app.root_path, "..", "frontend", "script.js"), "rb") as file:
+        original = file.read()
+    response = client.get(f"/{script_name}", headers={"Accept-Encoding": "gzip, deflate"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "immutable" in response.headers["Cache-Control"]
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data) == original
+
+    plain = client.get(f"/{script_name}", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.data == original
+    revalidated = client.get(f"/{script_name}", headers={
+        "Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]
+    })
+    assert revalidated.status_code == 304
+
+    assert client.get("/script.js").headers["Cache-Control"] == "no-cache"
+    assert client.get("/missing.js").status_code == 404
+
+# Teste 74: Arquivamento das concluídas antigas em blocos
+def test_archive_completed_tasks(app, client):
+    ids = [client.post("/tasks/", json={
+        "description": f"Tarefa {i}", "category": "Casa", "deadline": f"2025-01-{10 - i:02d}"
+    }).get_json()["id"] for i in range(6)]
+    for task_id in ids[:4] + ids[5:]:
+        client.patch(f"/tasks/{task_id}/complete")
+    stats = client.get("/tasks/stats").get_json()
+    version = client.get("/tasks/?since=0").get_json()["version"]
+
+    with app.app_context():
+        manager = TaskManager(db)
+        assert manager.archive_completed(older_than_days=30) == 0
+        later = datetime.utcnow() + timedelta(days=31)
+        assert manager.archive_completed(older_than_days=30, chunk_size=3, now=later) == 5
+
+    hot = client.get("/tasks/").get_json()
+    assert [task["id"] for task in hot] == [ids[4]]
+    full = client.get("/tasks/?include_archived=true").get_json()
+    # Prazos decrescentes na criação: a união volta ordenada por prazo
+    assert [task["id"] for task in full] == ids[::-1]
+    assert client.get("/tasks/?include_archived=true&completed=false").get_json() == [
+        task for task in hot if not task["completed"]
+    ]
+    page = client.get("/tasks/?include_archived=true&limit=4").get_json()
+    rest = client.get(f"/tasks/?include_archived=true&limit=4&cursor={page['next_cursor']}").get_json()
+    assert page["tasks"] + rest["tasks"] == full
+
+    assert client.get("/tasks/stats").get_json() == stats
+    assert sorted(client.get(f"/tasks/?since={version}").get_json()["deleted"]) == sorted(ids[:4] + ids[5:])
+
+    client.delete("/tasks/clear")
+    assert client.get("/tasks/?include_archived=true").get_json() == []
+    assert client.get("/tasks/stats").get_json()["total"] == 0
+
+# Teste 75: Comando de linha para o arquivamento
+def test_archive_cli_command(app, client):
+    client.post("/tasks/", json={"description": "Tarefa", "category": "Casa", "deadline": "2025-01-01"})
+    result = app.test_cli_runner().invoke(args=["archive", "--days", "0"])
+    assert result.exit_code == 0
+    assert "0 tarefa(s) arquivada(s)" in result.output
+
+# Teste 76: Gravação do tráfego de /tasks para reprodução de carga
+def test_traffic_recording(tmp_path, monkeypatch):
+    path = tmp_path / "trace.jsonl"
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'record.db'}")
+    monkeypatch.setenv("TRAFFIC_RECORD_PATH", str(path))
+    record_app = create_app('production')
+    record_client = record_app.test_client()
+    task = record_client.post("/tasks/", json={"description": "A", "category": "Casa", "deadline": "2025-01-01"}).get_json()
+    record_client.patch(f"/tasks/{task['id']}/complete")
+    record_client.get("/tasks/?completed=true")
+    record_client.get("/healthz")
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(entry["method"], entry["path"], entry["query"]) for entry in entries] == [
+        ("POST", "/tasks/", ""),
+        ("PATCH", "/tasks/{id}/complete", ""),
+        ("GET", "/tasks/", "completed=true"),
+    ]
+    assert entries[0]["json"]["description"] == "A"
+    with record_app.app_context():
+        db.engine.dispose()
+
+# Teste 77: Banco travado responde 503 com Retry-After
+def test_database_locked_returns_503(client, monkeypatch):
+    def locked(self, *args, **kwargs):
+        raise OperationalError("INSERT", {}, sqlite3.OperationalError("database is locked"))
+    monkeypatch.setattr(TaskManager, "add_task", locked)
+    response = client.post("/tasks/", json={"description": "A", "category": "Casa", "deadline": "2025-01-01"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.get_json() == {"error": "database is locked"}
+
+def _read_model_apps(tmp_path, monkeypatch):
+    # Dois apps no mesmo banco: um com o modelo de leitura, outro lendo do SQLite
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'read.db'}")
+    monkeypatch.setenv("READ_MODEL_VERIFY_SECONDS", "3600")
+    db_app = create_app('production')
+    monkeypatch.setenv("READ_MODEL", "1")
+    memory_app = create_app('production')
+    return memory_app, db_app
+
+# Teste 78: Listagens do modelo em memória iguais às do banco
+def test_read_model_matches_database(tmp_path, monkeypatch):
+    memory_app, db_app = _read_model_apps(tmp_path, monkeypatch)
+    memory, database = memory_app.test_client(), db_app.test_client()
+    queries = [
+        "/tasks/", "/tasks/?completed=false", "/tasks/?completed=true",
+        "/tasks/?category=Casa,Pessoal", "/tasks/?due_before=2025-01-05&due_after=2025-01-02",
+        "/tasks/?overdue=true&fields=id,deadline", "/tasks/?limit=3",
+    ]
+
+    def check():
+        for query in queries:
+            expected = database.get(query).get_json()
+            assert memory.get(query).get_json() == expected, query
+            if query.endswith("limit=3"):
+                cursor = expected["next_cursor"]
+                while cursor:
+                    page = database.get(f"{query}&cursor={cursor}").get_json()
+                    assert memory.get(f"{query}&cursor={cursor}").get_json() == page
+                    cursor = page["next_cursor"]
+
+    memory.post("/tasks/batch", json=[
+        {"description": f"T{i}", "category": ["Casa", "Pessoal", "Trabalho"][i % 3],
+         "deadline": f"2025-01-{i % 7 + 1:02d}" if i % 4 else None}
+        for i in range(12)
+    ])
+    check()
+    memory.put("/tasks/2", json={"deadline": "2025-01-03", "category": "Casa"})
+    memory.patch("/tasks/3/complete")
+    memory.patch("/tasks/complete", json={"category": "Pessoal"})
+    memory.delete("/tasks/5")
+    check()
+    # Escritas de outro processo chegam pelo delta da versão global
+    database.post("/tasks/", json={"description": "Outro", "category": "Casa", "deadline": "2025-01-01"})
+    database.delete("/tasks/", json={"ids": [6, 7]})
+    database.patch("/tasks/8/complete")
+    check()
+    with db_app.app_context():
+        TaskManager(db).archive_completed(older_than_days=0, now=datetime.utcnow() + timedelta(days=1))
+    check()
+    memory.delete("/tasks/clear")
+    check()
+    for app in (memory_app, db_app):
+        with app.app_context():
+            db.engine.dispose()
+
+# Teste 79: Leituras do modelo não consultam a tabela task e divergências são corrigidas
+def test_read_model_serves_from_memory(tmp_path, monkeypatch):
+    memory_app, db_app = _read_model_apps(tmp_path, monkeypatch)
+    memory = memory_app.test_client()
+    memory.post("/tasks/", json={"description": "A", "category": "Casa", "deadline": "2025-01-01"})
+    memory.post("/tasks/", json={"description": "B", "category": "Casa", "deadline": "2025-01-02"})
+
+    statements = []
+    with memory_app.app_context():
+        engine = db.engine
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    db.event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert len(memory.get("/tasks/?completed=false").get_json()) == 2
+    finally:
+        db.event.remove(engine, "before_cursor_execute", record)
+    assert statements and all("FROM task " not in statement and "FROM task\n" not in statement
+                              for statement in statements)
+
+    # Divergência sem mudança de versão: a verificação periódica recarrega
+    read_model = memory_app.extensions["read_model"]
+    read_model._remove(read_model._records[1])
+    read_model.verify_seconds = 0
+    assert [task["id"] for task in memory.get("/tasks/").get_json()] == [1, 2]
+    for app in (memory_app, db_app):
+        with app.app_context():
+            db.engine.dispose()
+
+# Teste 80: Tombstones além da retenção são descartados e pedem resync
+def test_tombstone_retention(app, client):
+    app.config['TOMBSTONE_RETENTION_VERSIONS'] = 2
+    ids = [client.post("/tasks/", json={"description": f"T{i}", "category": "Casa", "deadline": "2025-12-31"}).get_json()["id"]
+           for i in range(4)]
+    version = client.get("/tasks/?since=0").get_json()["version"]
+    client.delete(f"/tasks/{ids[0]}")
+    client.delete(f"/tasks/{ids[1]}")
+    client.delete(f"/tasks/{ids[2]}")
+
+    with app.app_context():
+        tombstones = db.session.execute(db.text("SELECT task_id FROM task_tombstone ORDER BY task_id")).scalars().all()
+    assert tombstones == ids[1:3]
+
+    # Versão cujas remoções foram descartadas: lista completa
+    changes = client.get(f"/tasks/?since={version}").get_json()
+    assert changes["resync"] is True
+    assert [t["id"] for t in changes["tasks"]] == [ids[3]] and changes["deleted"] == []
+
+    # Dentro da retenção, o delta continua incremental
+    changes = client.get(f"/tasks/?since={version + 1}").get_json()
+    assert changes["resync"] is False
+    assert changes["tasks"] == [] and changes["deleted"] == ids[1:3]
+
+# Teste 81: O ETag da listagem de atrasadas muda com o dia
+def test_overdue_etag_changes_with_date(client, monkeypatch):
+    import app.routes as routes
+
+    client.post("/tasks/", json={"description": "T", "category": "Casa", "deadline": "2025-06-02"})
+    class Day(datetime):
+        current = datetime(2025, 6, 1, 23, 59)
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current
+    monkeypatch.setattr(routes, "datetime", Day)
+
+    first = client.get("/tasks/?overdue=true")
+    assert first.get_json() == []
+    assert client.get("/tasks/?overdue=true", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    # Sem nenhuma alteração no banco, a tarefa fica atrasada no dia seguinte
+    Day.current = datetime(2025, 6, 3, 0, 1)
+    after = client.get("/tasks/?overdue=true", headers={"If-None-Match": first.headers["ETag"]})
+    assert after.status_code == 200
+    assert [t["description"] for t in after.get_json()] == ["T"]
+    assert after.headers["ETag"] != first.headers["ETag"]
+
+# Teste 82: Alterações de outro processo chegam aos assinantes pelo repasse
+def test_event_relay_between_processes(tmp_path, monkeypatch):
+    from app.events import EventBroker
+    from app.relay import EventRelay
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'relay.db'}")
+    app = create_app('production')
+    client = app.test_client()
+    # Broker de outro worker: nada do que este app publica chega a ele
+    other = EventBroker()
+    relay = EventRelay(app, db, other)
+    subscription = other.subscribe()
+
+    def received():
+        relay.poll()
+        events = []
+        while not subscription.empty():
+            events.append(subscription.get_nowait())
+        return events
+
+    assert received() == []
+    a = client.post("/tasks/", json={"description": "A", "category": "Casa", "deadline": "2025-01-01"}).get_json()
+    b = client.post("/tasks/", json={"description": "B", "category": "Casa", "deadline": "2025-01-02"}).get_json()
+    client.patch(f"/tasks/{a['id']}/complete")
+    client.delete(f"/tasks/{b['id']}")
+    events = received()
+    assert [(event["type"], event.get("id")) for event in events] == [("deleted", b["id"]), ("updated", None)]
+    assert events[1]["task"] == {**a, "completed": True}
+    assert received() == []
+
+    # Versões publicadas pelo próprio processo não são repetidas
+    client.post("/tasks/", json={"description": "C", "category": "Casa", "deadline": "2025-01-03"})
+    with app.app_context():
+        version = TaskManager(db).current_version()
+    other.publish([{"type": "created", "version": version}])
+    assert subscription.get_nowait()["version"] == version
+    assert received() == []
+
+    client.delete("/tasks/clear")
+    assert [event["type"] for event in received()] == ["resync"]
+    other.unsubscribe(subscription)
+    with app.app_context():
+        db.engine.dispose()
+
+# Teste 83: Ids de tarefas arquivadas ou removidas não são reaproveitados
+def test_archived_ids_are_not_reused(app, client):
+    ids = [client.post("/tasks/", json={"description": f"T{i}", "category": "Casa", "deadline": "2025-01-01"}).get_json()["id"]
+           for i in range(3)]
+    for task_id in ids[:2]:
+        client.patch(f"/tasks/{task_id}/complete")
+    later = datetime.utcnow() + timedelta(days=31)
+    with app.app_context():
+        assert TaskManager(db).archive_completed(older_than_days=30, now=later) == 2
+    client.delete(f"/tasks/{ids[2]}")
+
+    new = client.post("/tasks/", json={"description": "N", "category": "Casa", "deadline": "2025-01-01"}).get_json()
+    assert new["id"] not in ids
+    full = client.get("/tasks/?include_archived=true").get_json()
+    assert [task["id"] for task in full] == ids[:2] + [new["id"]]
+
+    client.patch(f"/tasks/{new['id']}/complete")
+    with app.app_context():
+        assert TaskManager(db).archive_completed(older_than_days=30, now=later) == 1
+    assert [task["id"] for task in client.get("/tasks/?include_archived=true").get_json()] == ids[:2] + [new["id"]]
+
+# Teste 84: Modelo à frente da versão lida na requisição não é recarregado
+def test_read_model_sync_ahead_of_request(tmp_path, monkeypatch):
+    memory_app, db_app = _read_model_apps(tmp_path, monkeypatch)
+    memory = memory_app.test_client()
+    read_model = memory_app.extensions["read_model"]
+    loads = []
+    original_load = read_model.load
+    monkeypatch.setattr(read_model, "load", lambda manager: loads.append(1) or original_load(manager))
+
+    memory.post("/tasks/", json={"description": "A", "category": "Casa", "deadline": "2025-01-01"})
+    with memory_app.app_context():
+        manager = TaskManager(db)
+        # Versão lida antes de um commit concorrente do mesmo processo
+        version = manager.current_version()
+        memory.post("/tasks/", json={"description": "B", "category": "Casa", "deadline": "2025-01-02"})
+        assert read_model.version == version + 1
+        read_model.sync(manager, version)
+        assert loads == []
+        assert [task["description"] for task in read_model.get_task_rows()[0]] == ["A", "B"]
+
+        # Banco restaurado para uma versão anterior à já lida: recarrega
+        read_model.sync(manager, manager.current_version())
+        assert loads == []
+        db.session.execute(db.text("UPDATE change_version SET version = 1"))
+        db.session.commit()
+        read_model.sync(manager, 1)
+        assert loads == [1]
+        db.session.remove()
+    for app in (memory_app, db_app):
+        with app.app_context():
+            db.engine.dispose()
+
+# Teste 85: O listener do modelo de leitura é do app e sai junto com ele
+def test_read_model_listener_scoped_to_app(tmp_path, monkeypatch):
+    import gc
+
+    gc.collect()
+    before = len(broker.listeners())
+    memory_app, _ = _read_model_apps(tmp_path, monkeypatch)
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'other.db'}")
+    other_app = create_app('production')
+    assert len(broker.listeners()) == before + 2
+
+    # Commits de outro app (outro banco) não entram no modelo deste
+    other_app.test_client().post("/tasks/", json={"description": "X", "category": "Casa", "deadline": "2025-01-01"})
+    assert len(memory_app.extensions["read_model"]) == 0
+    assert len(other_app.extensions["read_model"]) == 1
+
+    for app in (memory_app, other_app):
+        with app.app_context():
+            db.engine.dispose()
+    del memory_app, other_app, app
+    gc.collect()
+    assert len(broker.listeners()) == before
+
+# Teste 86: Commits de outro worker entre commits locais não se perdem
+def test_read_model_gap_from_other_worker(tmp_path, monkeypatch):
+    memory_app, db_app = _read_model_apps(tmp_path, monkeypatch)
+    memory, database = memory_app.test_client(), db_app.test_client()
+    task = memory.post("/tasks/", json={"description": "A", "category": "Casa", "deadline": "2025-01-01"}).get_json()
+    assert [t["description"] for t in memory.get("/tasks/").get_json()] == ["A"]
+
+    # Outro worker altera e cria tarefas; depois, um commit local
+    database.put(f"/tasks/{task['id']}", json={"description": "A-editada"})
+    database.post("/tasks/", json={"description": "B", "category": "Casa", "deadline": "2025-01-02"})
+    memory.post("/tasks/", json={"description": "C", "category": "Casa", "deadline": "2025-01-03"})
+
+    expected = database.get("/tasks/").get_json()
+    assert [t["description"] for t in expected] == ["A-editada", "B", "C"]
+    response = memory.get("/tasks/")
+    assert response.get_json() == expected
+    assert response.headers["ETag"] == database.get("/tasks/").headers["ETag"]
+
+    # Edição perdida sem mudança de contagem: a verificação compara as versões
+    read_model = memory_app.extensions["read_model"]
+    stale = read_model._records[task["id"]]
+    read_model._delete(task["id"], stale.version)
+    read_model._upsert({**expected[0], "description": "antiga"}, stale.version - 1)
+    assert read_model.get_task_rows()[0][0]["description"] == "antiga"
+    read_model.verify_seconds = 0
+    assert memory.get("/tasks/").get_json() == expected
+    for app in (memory_app, db_app):
+        with app.app_context():
+            db.engine.dispose()
+
+# Teste 87: Acima do limite de streams SSE a conexão é recusada com 503
+def test_event_stream_limit(app, client):
+    app.config['SSE_MAX_STREAMS'] = 1
+    first = client.get("/tasks/events")
+    assert first.status_code == 200
+    next(first.response)
+    second = client.get("/tasks/events")
+    assert second.status_code == 503
+    assert second.headers["Retry-After"] == "5"
+    first.close()
+    again = client.get("/tasks/events")
+    assert again.status_code == 200
+    again.close()
+
+# Teste 88: Abrir (e migrar) um tenant não bloqueia as consultas dos outros
+def test_tenant_open_does_not_block_others(tmp_path):
+    import threading
+
+    engines = TenantEngines(str(tmp_path), db.metadata)
+    first = engines.create("a")
+    gate, started = threading.Event(), threading.Event()
+    original = engines._open
+
+    def slow_open(tenant):
+        started.set()
+        assert gate.wait(5)
+        return original(tenant)
+    engines._open = slow_open
+    opener = threading.Thread(target=engines.create, args=("b",))
+    opener.start()
+    try:
+        assert started.wait(5)
+        assert engines.engine("a") is first
+        assert engines.open_tenants() == ["a"]
+    finally:
+        gate.set()
+        opener.join(5)
+    assert engines.open_tenants() == ["a", "b"]
+    engines.dispose_all()
+
+# Teste 89: Comandos que falham não acumulam estado na conexão instrumentada
+def test_metrics_failed_statements(app, client):
+    with app.app_context():
+        with db.engine.connect() as connection:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    connection.exec_driver_sql("SELECT * FROM tabela_inexistente")
+                connection.rollback()
+            assert connection.exec_driver_sql("SELECT 1").scalar() == 1
+            assert "query_start" not in connection.info
+    assert client.get("/tasks/").status_code == 200
 
 # ------------------------------ Testes e2e ------------------------------ 
 